@@ -1,80 +1,205 @@
+import argparse
+import functools
+import heapq
+import multiprocessing
+import os
 import sys
+import zipfile
+from collections import namedtuple
+from fnmatch import fnmatch
+
+if __name__ == "__main__":
+    # Run as a script: the bbm103 package of helpers shared by the assignments
+    # is in the repository root, which is not on the module search path yet.
+    # Importers put it there themselves, so importing changes nothing.
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bbm103 import corpus, profiling
+
+# Characters of the one-line format, 0 (or .) is an empty square.
+LINE_NUMBERS = "0123456789ABCDEFGHIJKLMNOP"
 
 def solve_sudoku_text(file_sudoku): 
     """
-    Converts a Sudoku string to matrix (list[list[int]]).   
+    Converts a Sudoku string to a flat Sudoku grid (bytearray).   
     Parameters: file_sudoku (str): String Sudoku text file.
-    Returns: list[list[int]] Sudoku matrix.
+    Returns: bytearray Sudoku grid, row by row.
     """
     with open(file_sudoku, "r") as file:
-        sudoku = []
+        return parse_sudoku_text(file.read())
 
-        for satir in file.read().strip().split('\n'):
-            sudoku.append(list(map(int, satir.split())))
+def get_sizes(sudoku):
+    """
+    Finds the side length and the submatrix side length of a flat Sudoku grid.
+    Parameters: bytearray Sudoku grid.
+    Returns: tuple() int size (9, 16, 25, ...) and int box size (3, 4, 5, ...).
+    """
+    # Rounded float roots instead of math.isqrt (Python 3.8+); they are exact
+    # for every perfect square a grid can have, and the check catches the rest.
+    size = int(round(len(sudoku) ** 0.5))
+    box_size = int(round(size ** 0.5))
+    if size * size != len(sudoku) or box_size * box_size != size or size == 0:
+        raise ValueError(f"A Sudoku needs N^2 x N^2 squares, got {len(sudoku)}.")
+    return size, box_size
+
+def parse_sudoku_text(text):
+    """
+    Converts the text of a Sudoku file to a flat Sudoku grid. The size of the
+    Sudoku (9x9, 16x16, 25x25, ...) is taken from the number of rows.
+    Parameters: text (str): Rows of space separated numbers.
+    Returns: bytearray Sudoku grid, row by row.
+    """
+    sudoku = bytearray()
+    rows = text.strip().split('\n')
 
-        return sudoku
+    for satir in rows:
+        numbers = list(map(int, satir.split()))
+        if len(numbers) != len(rows):
+            raise ValueError(f"Expected {len(rows)} numbers in every row, got {satir!r}.")
+        sudoku.extend(numbers)
 
-def get_row(sudoku, n): 
+    size, box_size = get_sizes(sudoku)
+    if max(sudoku) > size:
+        raise ValueError(f"Numbers of a {size}x{size} Sudoku must be between 0 and {size}.")
+    return sudoku
+
+def parse_sudoku_line(line):
+    """
+    Converts a one-line Sudoku to a flat Sudoku grid. Numbers above 9 are
+    written as letters (A = 10, ..., P = 25), 0 or . is an empty square.
+    Parameters: line (str): One-line Sudoku of 81, 256 or 625 characters.
+    Returns: bytearray Sudoku grid, row by row.
+    """
+    line = line.strip().replace(".", "0").upper()
+    sudoku = bytearray(len(line))
+    for i, character in enumerate(line):
+        number = LINE_NUMBERS.find(character)
+        if number == -1:
+            raise ValueError(f"Unexpected character {character!r} in {line!r}.")
+        sudoku[i] = number
+
+    size, box_size = get_sizes(sudoku)
+    if max(sudoku) > size:
+        raise ValueError(f"Numbers of a {size}x{size} Sudoku must be between 0 and {size}.")
+    return sudoku
+
+def parse_sudoku_record(lines):
+    """
+    Converts the rows of a corpus record to a flat Sudoku grid. Rows of
+    one-digit numbers separated by single spaces are decoded with one
+    bytes.translate call (see corpus.decode_digit_row); other rows are split into numbers.
+    Parameters: lines (list[bytes]): Rows of space separated numbers.
+    Returns: bytearray Sudoku grid, row by row.
+    """
+    sudoku = bytearray()
+    for line in lines:
+        row = corpus.decode_digit_row(line)
+        if row is None or len(row) != len(lines):
+            numbers = line.split()
+            if len(numbers) != len(lines):
+                raise ValueError(f"Expected {len(lines)} numbers in every row, got {line.decode()!r}.")
+            row = bytes(map(int, numbers))
+        sudoku += row
+
+    size, box_size = get_sizes(sudoku)
+    if max(sudoku) > size:
+        raise ValueError(f"Numbers of a {size}x{size} Sudoku must be between 0 and {size}.")
+    return sudoku
+
+def is_corpus_file(path):
+    """
+    Tells a corpus of Sudoku grids (see corpus.iterate_corpus_records) from a file of
+    one-line Sudokus by the first line that is not empty.
+    Parameters: path (str).
+    Returns: bool True if the first line holds more than one number.
+    """
+    with open(path, "rb") as file:
+        for line in file:
+            if line.strip():
+                return len(line.split()) > 1
+    return False
+
+def sudoku_to_line(sudoku):
+    """
+    Converts a flat Sudoku grid to the one-line format of parse_sudoku_line.
+    Parameters: bytearray Sudoku grid.
+    Returns: str One-line Sudoku.
+    """
+    return "".join(LINE_NUMBERS[number] for number in sudoku)
+
+def get_row(sudoku, n, size=None): 
     """
     Retrieves the value of Sudoku's rows' nth element.
-    Parameters: list[list[int]] Sudoku matrix.
+    Parameters: bytearray Sudoku grid, n, int size: From get_sizes, found again when None.
     Returns: set{} Set of rows' elements.
     """
-    return set(sudoku[n])
+    if size is None:
+        size = get_sizes(sudoku)[0]
+    return set(sudoku[n * size:(n + 1) * size])
 
 
 
-def get_col(sudoku, n):
+def get_col(sudoku, n, size=None):
     """
     Retrieves the value of Sudoku's rows' nth element.
-    Parameters: list[list[int]] Sudoku matrix, n.
+    Parameters: bytearray Sudoku grid, n, int size: From get_sizes, found again when None.
     Returns: set{} Set of columns' elements.
     """
-    return set(row[n] for row in sudoku)
+    if size is None:
+        size = get_sizes(sudoku)[0]
+    return set(sudoku[n::size])
 
-def get_submatrix(sudoku, row_of_submatrix, col_of_submatrix):
+def get_submatrix(sudoku, row_of_submatrix, col_of_submatrix, size=None, box_size=None):
     """
     Retreives the values of Sudoku's submatrixs' elements.
-    Parameters: list[list[int]] Sudoku matrix, int row of submatrix, int col of submatrix.
+    Parameters: bytearray Sudoku grid, int row of submatrix, int col of submatrix,
+    int size and int box_size: From get_sizes, found again when None.
     Returns: set() Set of submatrix's elements.
     """
-    beginning_row_sub = (row_of_submatrix // 3) * 3
-    beginning_col_sub = (col_of_submatrix // 3) * 3
+    if size is None or box_size is None:
+        size, box_size = get_sizes(sudoku)
+    beginning_row_sub = (row_of_submatrix // box_size) * box_size
+    beginning_col_sub = (col_of_submatrix // box_size) * box_size
 
     submatrix = set()
 
-    for i in range(beginning_row_sub, beginning_row_sub + 3):
-        for j in range(beginning_col_sub, beginning_col_sub + 3):
-            submatrix.add(sudoku[i][j])
+    for i in range(beginning_row_sub, beginning_row_sub + box_size):
+        for j in range(beginning_col_sub, beginning_col_sub + box_size):
+            submatrix.add(sudoku[i * size + j])
 
     return submatrix
 
-def find_possible_numbers(sudoku, row, col):
+def find_possible_numbers(sudoku, row, col, size=None, box_size=None):
     """
     Find the possible numbers for empty square. 
-    Parameters: list[list[int]] Sudoku matrix, int row, int col.
+    Parameters: bytearray Sudoku grid, int row, int col,
+    int size and int box_size: From get_sizes, found again when None.
     Returns: set{} Set of possible numbers.
     """
-    row_numbers = get_row(sudoku, row)
-    col_numbers = get_col(sudoku, col)
-    submatrix_numbers = get_submatrix(sudoku, row, col)
+    if size is None or box_size is None:
+        size, box_size = get_sizes(sudoku)
+    row_numbers = get_row(sudoku, row, size)
+    col_numbers = get_col(sudoku, col, size)
+    submatrix_numbers = get_submatrix(sudoku, row, col, size, box_size)
     
     merged = set(row_numbers) | set(col_numbers) | set(submatrix_numbers)
-    possibles = set(range(1, 10)) - merged
+    possibles = set(range(1, size + 1)) - merged
     if 0 in possibles:
         possibles.remove(0)
     return possibles
 
-def solve_one_square(sudoku):
+def solve_one_square(sudoku, size=None, box_size=None):
     """
     Solve a one empty square if there is one possible number.
-    Parameters: list[list[int]] Sudoku matrix.
+    Parameters: bytearray Sudoku grid, int size and int box_size: From get_sizes, found again when None.
     Returns: tuple() Tuple of row, col and answer.
     """
-    for r in range(9):
-        for c in range(9):
-            if sudoku[r][c] == 0:
-                possibles = find_possible_numbers(sudoku, r, c)
+    if size is None or box_size is None:
+        size, box_size = get_sizes(sudoku)
+    for r in range(size):
+        for c in range(size):
+            if sudoku[r * size + c] == 0:
+                possibles = find_possible_numbers(sudoku, r, c, size, box_size)
                 if len(possibles) == 1:
                     answer = possibles.pop()
 
@@ -83,60 +208,607 @@ def solve_one_square(sudoku):
 def count_zeros(sudoku):
     """
     Count the number of empty squares. 
-    Parameters: list[list[int]] Sudoku matrix.
+    Parameters: bytearray Sudoku grid.
     Returns: int count of zeros.
     """
-    count = 0
+    return sudoku.count(0)
+
+def sudokuToString(sudoku):
+    """
+    Convert Sudoku grid to string Sudoku.
+    Parameters: bytearray Sudoku grid.
+    Returns: str String Sudoku.
+    """
+    size = get_sizes(sudoku)[0]
+    string_rows = []
+
+    for r in range(size):
+        #Merging a row of integers to a string:
+        string_rows.append(" ".join(map(str, sudoku[r * size:(r + 1) * size])) + "\n")
+
+    return "".join(string_rows)
+
+Layout = namedtuple("Layout", "size box_size box_of_square units units_of_square peers_of_square")
+
+@functools.lru_cache(maxsize=None)
+def get_layout(size):
+    """
+    Builds the lookup tables of a Sudoku size once. Squares are numbered
+    row * size + col, like the indices of the flat grid.
+    Parameters: int size (9, 16, 25, ...).
+    Returns: Layout Submatrix of every square, every unit (rows, columns and
+    submatrices), the units of every square and the sorted peers of every square.
+    """
+    box_size = int(round(size ** 0.5))
+    box_of_square = [(r // box_size) * box_size + c // box_size for r in range(size) for c in range(size)]
+    units = ([[r * size + c for c in range(size)] for r in range(size)]
+             + [[r * size + c for r in range(size)] for c in range(size)]
+             + [[square for square in range(size * size) if box_of_square[square] == box] for box in range(size)])
+    units_of_square = [[unit for unit in units if square in unit] for square in range(size * size)]
+    peers_of_square = [sorted(set(peer for unit in units_of_square[square] for peer in unit) - {square})
+                       for square in range(size * size)]
+    return Layout(size, box_size, box_of_square, units, units_of_square, peers_of_square)
+
+def build_occupancy_masks(sudoku):
+    """
+    Builds the occupancy masks of every row, column and submatrix.
+    Bit (number - 1) of a mask is set when that number is already placed.
+    Parameters: bytearray Sudoku grid.
+    Returns: tuple() Lists of row masks, column masks and submatrix masks.
+    """
+    size = get_sizes(sudoku)[0]
+    box_of_square = get_layout(size).box_of_square
+    row_masks = [0] * size
+    col_masks = [0] * size
+    box_masks = [0] * size
+
+    for square, number in enumerate(sudoku):
+        if number != 0:
+            bit = 1 << (number - 1)
+            row_masks[square // size] |= bit
+            col_masks[square % size] |= bit
+            box_masks[box_of_square[square]] |= bit
+
+    return row_masks, col_masks, box_masks
+
+def has_conflicting_clues(sudoku):
+    """
+    Checks if a number is given twice in a row, column or submatrix. The
+    engines only place numbers in empty squares, so they never look at the
+    clues themselves and would return a full grid like this as solved.
+    Parameters: bytearray Sudoku grid.
+    Returns: bool True if two clues conflict.
+    """
+    size = get_sizes(sudoku)[0]
+    box_of_square = get_layout(size).box_of_square
+    row_masks = [0] * size
+    col_masks = [0] * size
+    box_masks = [0] * size
+
+    for square, number in enumerate(sudoku):
+        if number != 0:
+            bit = 1 << (number - 1)
+            row, col, box = square // size, square % size, box_of_square[square]
+            if (row_masks[row] | col_masks[col] | box_masks[box]) & bit:
+                return True
+            row_masks[row] |= bit
+            col_masks[col] |= bit
+            box_masks[box] |= bit
+    return False
+
+def iterate_scan_squares(sudoku, number_of_zeros):
+    """
+    Fills the empty squares one by one with solve_one_square.
+    Parameters: bytearray Sudoku grid, int number_of_zeros.
+    Returns: generator of tuple() Row, col and answer of every step.
+    """
+    size, box_size = get_sizes(sudoku)
+    for i in range(number_of_zeros):
+        row, col, answer = solve_one_square(sudoku, size, box_size)
+        sudoku[row * size + col] = answer
+        yield row, col, answer
+
+def get_possibles_mask(layout, masks, square):
+    """
+    Finds the possible numbers of a square from the occupancy masks.
+    Parameters: Layout, tuple() occupancy masks, int square.
+    Returns: int Mask of the possible numbers.
+    """
+    row_masks, col_masks, box_masks = masks
+    size = layout.size
+    taken = row_masks[square // size] | col_masks[square % size] | box_masks[layout.box_of_square[square]]
+    return ((1 << size) - 1) & ~taken
+
+def is_single(possibles):
+    """
+    Checks if a mask holds exactly one possible number.
+    Parameters: int mask.
+    Returns: bool True if there is only one possible number.
+    """
+    return possibles != 0 and possibles & (possibles - 1) == 0
+
+def find_hidden_single(sudoku, layout, masks):
+    """
+    Finds the first empty square (row-major) holding a number that cannot go
+    anywhere else in its row, column or submatrix.
+    Parameters: bytearray Sudoku grid, Layout, tuple() occupancy masks.
+    Returns: tuple() Row, col and answer, or None if there is no hidden single.
+    """
+    possibles = [0] * len(sudoku)
+    for square in range(len(sudoku)):
+        if sudoku[square] == 0:
+            possibles[square] = get_possibles_mask(layout, masks, square)
+
+    for square in range(len(sudoku)):
+        if possibles[square] == 0:
+            continue
+        for unit in layout.units_of_square[square]:
+            others = 0
+            for other in unit:
+                if other != square:
+                    others |= possibles[other]
+            only_here = possibles[square] & ~others
+            if is_single(only_here):
+                row, col = divmod(square, layout.size)
+                return row, col, only_here.bit_length()
+
+def propagate_squares(sudoku, masks, number_of_zeros, hidden_singles):
+    """
+    Fills squares with one possible number in the same order as
+    iterate_scan_squares, keeping occupancy masks and a queue of single squares
+    instead of rescanning the whole grid at every step. When hidden_singles
+    is set, a hidden single is placed whenever the queue runs dry.
+    Stops early when neither kind of single is left.
+    Parameters: bytearray Sudoku grid, tuple() occupancy masks, int number_of_zeros, bool hidden_singles.
+    Returns: generator of tuple() Row, col and answer of every step.
+    """
+    layout = get_layout(get_sizes(sudoku)[0])
+    size = layout.size
+    row_masks, col_masks, box_masks = masks
+
+    # solve_one_square picks the first single square in row-major order,
+    # so the queue is a heap of square indices.
+    singles = []
+    for square in range(len(sudoku)):
+        if sudoku[square] == 0 and is_single(get_possibles_mask(layout, masks, square)):
+            heapq.heappush(singles, square)
+
+    for i in range(number_of_zeros):
+        step = None
+        while singles:
+            square = heapq.heappop(singles)
+            possibles = get_possibles_mask(layout, masks, square)
+            # A square can be queued more than once or lose its last possible number later.
+            if sudoku[square] == 0 and is_single(possibles):
+                step = square // size, square % size, possibles.bit_length()
+                break
+
+        if step is None and hidden_singles:
+            step = find_hidden_single(sudoku, layout, masks)
+        if step is None:
+            return
+
+        row, col, answer = step
+        square = row * size + col
+        bit = 1 << (answer - 1)
+        sudoku[square] = answer
+        row_masks[row] |= bit
+        col_masks[col] |= bit
+        box_masks[layout.box_of_square[square]] |= bit
+
+        # Only the peers of the placed square can become single squares.
+        for peer in layout.peers_of_square[square]:
+            if sudoku[peer] == 0 and is_single(get_possibles_mask(layout, masks, peer)):
+                heapq.heappush(singles, peer)
 
-    for row in sudoku:
-        for number in row:
-            if number == 0:
+        yield step
+
+def eliminate_possible(layout, possibles, square, bit):
+    """
+    Removes a possible number from a square and propagates the consequences:
+    a square left with one number is removed from its peers, and a number left
+    with one place in a unit is placed there.
+    Parameters: Layout, list[int] possible number masks of every square, int square, int bit of the number.
+    Returns: bool False if a contradiction was found, else True.
+    """
+    if not possibles[square] & bit:
+        return True
+    possibles[square] &= ~bit
+    left = possibles[square]
+    if left == 0:
+        return False
+    if is_single(left):
+        for peer in layout.peers_of_square[square]:
+            if not eliminate_possible(layout, possibles, peer, left):
+                return False
+    for unit in layout.units_of_square[square]:
+        places = [other for other in unit if possibles[other] & bit]
+        if not places:
+            return False
+        if len(places) == 1 and not assign_possible(layout, possibles, places[0], bit):
+            return False
+    return True
+
+def assign_possible(layout, possibles, square, bit):
+    """
+    Places a number on a square by eliminating every other possible number.
+    Parameters: Layout, list[int] possible number masks of every square, int square, int bit of the number.
+    Returns: bool False if a contradiction was found, else True.
+    """
+    others = possibles[square] & ~bit
+    while others:
+        other_bit = others & -others
+        others ^= other_bit
+        if not eliminate_possible(layout, possibles, square, other_bit):
+            return False
+    return True
+
+def search_possibles(layout, possibles):
+    """
+    Backtracking search that always branches on the square with the fewest
+    possible numbers (MRV) and propagates every guess.
+    Parameters: Layout, list[int] possible number masks of every square.
+    Returns: list[int] Masks of the solved squares, or None if there is no solution.
+    """
+    best_square = None
+    best_count = layout.size + 1
+    for square, mask in enumerate(possibles):
+        if not is_single(mask):
+            count = bin(mask).count("1")
+            if count < best_count:
+                best_square, best_count = square, count
+
+    if best_square is None:
+        return possibles
+
+    mask = possibles[best_square]
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        guess = possibles[:]
+        if assign_possible(layout, guess, best_square, bit):
+            solution = search_possibles(layout, guess)
+            if solution is not None:
+                return solution
+    return None
+
+def search_solution(sudoku):
+    """
+    Solves the Sudoku grid with constraint propagation and backtracking.
+    Parameters: bytearray Sudoku grid.
+    Returns: bytearray Solved Sudoku grid, or None if there is no solution.
+    """
+    layout = get_layout(get_sizes(sudoku)[0])
+    possibles = [(1 << layout.size) - 1] * len(sudoku)
+    for square, number in enumerate(sudoku):
+        if number != 0 and not assign_possible(layout, possibles, square, 1 << (number - 1)):
+            return None
+
+    solution = search_possibles(layout, possibles)
+    if solution is None:
+        return None
+    return bytearray(mask.bit_length() for mask in solution)
+
+def iterate_mask_squares(sudoku, number_of_zeros):
+    """
+    Fills the empty squares in the same order as iterate_scan_squares using
+    occupancy masks and a queue of single squares.
+    Parameters: bytearray Sudoku grid, int number_of_zeros.
+    Returns: generator of tuple() Row, col and answer of every step.
+    """
+    placed = 0
+    for step in propagate_squares(sudoku, build_occupancy_masks(sudoku), number_of_zeros, False):
+        placed += 1
+        yield step
+    if placed < number_of_zeros:
+        raise ValueError("There is no empty square with only one possible number.")
+
+def iterate_search_squares(sudoku, number_of_zeros):
+    """
+    Places naked and hidden singles step by step, then solves whatever is left
+    by backtracking and reports those squares in row-major order.
+    Parameters: bytearray Sudoku grid, int number_of_zeros.
+    Returns: generator of tuple() Row, col and answer of every step.
+    """
+    placed = 0
+    for step in propagate_squares(sudoku, build_occupancy_masks(sudoku), number_of_zeros, True):
+        placed += 1
+        yield step
+    if placed == number_of_zeros:
+        return
+
+    if solution_cache is None:
+        solution = search_solution(sudoku)
+    else:
+        solution = solution_cache.solve(sudoku, search_solution)
+    if solution is None:
+        raise ValueError("Sudoku has no solution.")
+    size = get_sizes(sudoku)[0]
+    for square in range(len(sudoku)):
+        if sudoku[square] == 0:
+            sudoku[square] = solution[square]
+            yield square // size, square % size, solution[square]
+
+# Solutions of the search engine by canonical form, None unless enable_solution_cache is called.
+solution_cache = None
+
+def enable_solution_cache(path=None, capacity=4096):
+    """
+    Lets the search engine look up the part it solves by backtracking in a
+    SolutionCache (see sudoku_cache.py), so repeated and isomorphic puzzles are
+    solved once. The singles before it are still placed step by step.
+    Parameters: path (str or None): sqlite file shared by runs and processes, None for memory only,
+    capacity (int): Solutions kept in memory.
+    Returns: SolutionCache
+    """
+    global solution_cache
+    import sudoku_cache
+    solution_cache = sudoku_cache.SolutionCache(path, capacity)
+    return solution_cache
+
+ENGINES = {
+    "scan": iterate_scan_squares,
+    "mask": iterate_mask_squares,
+    "search": iterate_search_squares,
+}
+
+def render_sudoku_steps(sudoku, number_of_zeros, engine="search", final_only=False):
+    """
+    Solves Sudoku and renders the steps and the solves into one buffer.
+    The board text is built once; every step only patches the placed number
+    in place before the board is copied into the log.
+    Parameters: bytearray Sudoku grid, int number_of_zeros, str engine name,
+    bool final_only: Render only the solved board instead of every step.
+    Returns: bytearray Contents of the output file.
+    """
+    size = get_sizes(sudoku)[0]
+    board = bytearray(sudokuToString(sudoku).encode())
+    number_bytes = [str(number).encode() for number in range(size + 1)]
+    separator = b"-" * 18
+
+    # Where every square starts in the board text.
+    offsets = []
+    offset = 0
+    for r in range(size):
+        for c in range(size):
+            offsets.append(offset)
+            offset += len(number_bytes[sudoku[r * size + c]]) + 1
+
+    log = bytearray()
+    step = 1
+    for row, col, answer in ENGINES[engine](sudoku, number_of_zeros):
+        square = row * size + col
+        start = offsets[square]
+        digits = number_bytes[answer]
+        if len(digits) == 1:
+            board[start] = digits[0]
+        else:
+            # Numbers above 9 are wider than the 0 they replace.
+            board[start:start + 1] = digits
+            for later in range(square + 1, len(offsets)):
+                offsets[later] += len(digits) - 1
+
+        if not final_only:
+            log += b"%s\nStep %d - %d @ R%dC%d\n%s\n" % (separator, step, answer, row + 1, col + 1, separator)
+            log += board
+        step += 1
+
+    if final_only:
+        return board
+    log += separator
+    return log
+
+def solve_sudoku(output_file, sudoku, number_of_zeros, engine="search", final_only=False): 
+    """
+    Solves Sudoku and writes the steps and the solves to an output file
+    with a single write.
+    Parameters: output_file (str), bytearray Sudoku grid, int number_of_zeros, str engine name,
+    bool final_only: Write only the solved board.
+    Returns: None
+    """
+    log = render_sudoku_steps(sudoku, number_of_zeros, engine, final_only)
+    with open(output_file, "wb") as file:
+        file.write(log)
+
+def iterate_batch_puzzles(source, pattern="*"):
+    """
+    Streams the puzzles of a batch one by one, without loading the whole batch.
+    A directory or a .zip archive holds one Sudoku file per puzzle (files whose
+    name matches pattern, in name order for directories and archive order for
+    zips); a corpus file holds Sudoku grids separated by empty lines (see
+    corpus.iterate_corpus_records); any other file holds one one-line puzzle (see
+    parse_sudoku_line) per line.
+    Parameters: source (str): Path of the batch, pattern (str): File name pattern.
+    Returns: generator of tuple() Kind ("grid", "line" or "record"), name and
+    text of every puzzle (the lines of the record for "record").
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path) and fnmatch(name, pattern):
+                with open(path, "r") as file:
+                    yield "grid", name, file.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if not info.is_dir() and fnmatch(name, pattern):
+                    yield "grid", name, archive.read(info).decode()
+    elif is_corpus_file(source):
+        for record_number, lines in enumerate(corpus.iterate_corpus_records(source), 1):
+            yield "record", str(record_number), lines
+    else:
+        with open(source, "r") as file:
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    yield "line", str(line_number), line
+
+def solve_batch_puzzle(puzzle, engine="search", final_only=False):
+    """
+    Solves one puzzle of a batch. Runs inside the worker processes.
+    Parameters: puzzle (tuple): Kind, name and text from iterate_batch_puzzles, engine (str),
+    final_only (bool): Only the solved board for "grid" puzzles.
+    Returns: tuple() Name and output text (the step log for "grid" puzzles,
+    the one-line solution for "line" and "record" puzzles).
+    """
+    kind, name, text = puzzle
+    try:
+        if kind == "grid":
+            sudoku = parse_sudoku_text(text)
+            return name, render_sudoku_steps(sudoku, count_zeros(sudoku), engine, final_only).decode()
+
+        sudoku = parse_sudoku_line(text) if kind == "line" else parse_sudoku_record(text)
+        if has_conflicting_clues(sudoku):
+            # The same answer as the vectorized path of sudoku_numpy.py.
+            raise ValueError("Sudoku has no solution.")
+        for square in ENGINES[engine](sudoku, count_zeros(sudoku)):
+            pass
+        return name, sudoku_to_line(sudoku)
+    except ValueError as error:
+        # One broken puzzle should not stop the rest of the batch.
+        return name, str(error)
+
+def iterate_line_blocks(puzzles, block_size):
+    """
+    Groups the texts of streamed puzzles into blocks.
+    Parameters: puzzles (generator): Output of iterate_batch_puzzles, block_size (int).
+    Returns: generator of list[str] Blocks of at most block_size puzzle texts.
+    """
+    block = []
+    for kind, name, text in puzzles:
+        block.append(text)
+        if len(block) == block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+def solve_batch(source, output, engine="search", workers=None, chunksize=16, pattern="*", vectorized=False,
+                final_only=False, cache=None):
+    """
+    Solves a batch of puzzles over a pool of worker processes. Puzzles are sent
+    to the workers in chunks and the results are written in input order:
+    one step log file per puzzle into the output directory for directories and
+    zips, one solution line per puzzle into the output file for line files and
+    corpus files. With vectorized, line files are solved chunksize puzzles at a
+    time by the NumPy propagator in sudoku_numpy.py.
+    Parameters: source (str), output (str), engine (str), workers (int or None for every core),
+    chunksize (int): Puzzles per dispatch, pattern (str): File name pattern for directories and zips,
+    vectorized (bool), final_only (bool): Write only the solved boards instead of step logs,
+    cache (str or None): sqlite file of a solution cache every worker opens (see enable_solution_cache).
+    Returns: int Number of solved puzzles.
+    """
+    puzzles = iterate_batch_puzzles(source, pattern)
+    solve = functools.partial(solve_batch_puzzle, engine=engine, final_only=final_only)
+    line_mode = not (os.path.isdir(source) or zipfile.is_zipfile(source))
+    # Every worker opens its own connection to the cache.
+    initializer, initargs = (enable_solution_cache, (cache,)) if cache else (None, ())
+
+    if vectorized:
+        if not line_mode or is_corpus_file(source):
+            raise ValueError("Vectorized batches need a one-puzzle-per-line file.")
+        # NumPy is only needed for this mode, so it is imported here.
+        import sudoku_numpy
+        count = 0
+        solve_block = functools.partial(sudoku_numpy.solve_lines, engine=engine)
+        with open(output, "w") as output_file, multiprocessing.Pool(workers, initializer, initargs) as pool:
+            for outputs in pool.imap(solve_block, iterate_line_blocks(puzzles, chunksize)):
+                for text in outputs:
+                    output_file.write(text + "\n")
+                count += len(outputs)
+        return count
+
+    count = 0
+    if line_mode:
+        with open(output, "w") as output_file, multiprocessing.Pool(workers, initializer, initargs) as pool:
+            for name, text in pool.imap(solve, puzzles, chunksize):
+                output_file.write(text + "\n")
                 count += 1
+        return count
 
+    os.makedirs(output, exist_ok=True)
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        for name, text in pool.imap(solve, puzzles, chunksize):
+            with open(os.path.join(output, name), "w") as file:
+                file.write(text)
+            count += 1
     return count
 
-def sudokuToString(sudoku):
+# Calls, seconds and counters of the instrumented functions, None while profiling is off.
+profile_stats = None
+
+def count_if_none(counter):
     """
-    Convert Sudoku matrix to string Sudoku.
-    Parameters: list[list[int]] Sudoku matrix.
-    Returns: str String Sudoku.
+    Makes a record function for profiling.instrument that counts the calls returning None.
+    Parameters: counter (str): Name of the counter.
+    Returns: callable
     """
-    string_sudoku = ""
+    def record(result):
+        if result is None:
+            profile_stats["counters"][counter] += 1
+    return record
 
-    for row in sudoku:
-        temp_list = []
-        for number in row:
-            #Merging a row of integers to a string:
-            temp_list.append(str(number))
-        string_row = " ".join(temp_list)
-        string_sudoku += string_row + "\n"
+def enable_profiling():
+    """
+    Starts counting and timing the hot paths of every engine: find_possible_numbers
+    and solve_one_square (scan), find_hidden_single (search) and
+    search_possibles (search nodes and dead ends). Their module names are bound
+    to wrappers only here, so the engines cost nothing extra while profiling is
+    off. Batch worker processes keep their own counts.
+    Parameters: None
+    Returns: dict profile_stats.
+    """
+    global profile_stats, find_possible_numbers, solve_one_square, find_hidden_single, search_possibles
+    if profile_stats is None:
+        profile_stats = profiling.new_stats("counters")
+        find_possible_numbers = profiling.instrument(find_possible_numbers, profile_stats)
+        solve_one_square = profiling.instrument(solve_one_square, profile_stats, count_if_none("no_single_square"))
+        find_hidden_single = profiling.instrument(find_hidden_single, profile_stats,
+                                                  count_if_none("no_hidden_single"))
+        search_possibles = profiling.instrument(search_possibles, profile_stats, count_if_none("dead_ends"))
+    return profile_stats
 
-    return string_sudoku
+if profiling.is_requested():
+    enable_profiling()
 
-def solve_sudoku(output_file, sudoku, number_of_zeros): 
+def run(args):
     """
-    Solves Sudoku and writes the steps and the solves to an output file. 
-    Parameters: output_file (str), list[list[int]] Sudoku matrix, int number_of_zeros.
+    Solves the Sudoku or the batch given on the command line.
+    Parameters: args (argparse.Namespace): Parsed arguments of main.
     Returns: None
     """
-    step = 1
-    with open(output_file, "w") as file:
-        for i in range(number_of_zeros):
-            row, col, answer = solve_one_square(sudoku)
-            sudoku[row][col] = answer
+    if args.batch:
+        solve_batch(args.input_file, args.output_file, args.engine, args.workers, args.chunksize, args.pattern,
+                    args.vectorized, args.final_only, args.cache)
+        return
+    if args.cache:
+        enable_solution_cache(args.cache)
 
-            file.write("-" * 18 + "\n" + f"Step {step} - {answer} @ R{row+1}C{col+1}" + "\n" + "-" * 18 + "\n")
-            file.write(sudokuToString(sudoku))
-            step += 1
-        file.write("-" * 18)
+    sudoku = solve_sudoku_text(args.input_file)
+    number_of_zeros = count_zeros(sudoku)
+    solve_sudoku(args.output_file, sudoku, number_of_zeros, args.engine, args.final_only) 
 
 def main():
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    sudoku = solve_sudoku_text(input_file)
-    number_of_zeros = count_zeros(sudoku)
-    solve_sudoku(output_file, sudoku, number_of_zeros) 
+    parser = argparse.ArgumentParser(description="Solves a Sudoku and writes every step to a file.")
+    parser.add_argument("input_file", help="Sudoku file, or with --batch a directory, .zip, corpus of "
+                                                  "Sudoku files separated by empty lines, or one-puzzle-per-line file")
+    parser.add_argument("output_file", help="output file, or with --batch an output directory for directories and zips")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="search",
+                        help="how the next square is found (default: search)")
+    parser.add_argument("--batch", action="store_true", help="solve many puzzles over a pool of processes")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --batch (default: every core)")
+    parser.add_argument("--chunksize", type=int, default=16, help="puzzles sent to a worker at once (default: 16)")
+    parser.add_argument("--pattern", default="*", help="file names to solve in a directory or zip (default: *)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="solve line files with the NumPy propagator, --chunksize puzzles at a time (needs numpy)")
+    parser.add_argument("--final-only", action="store_true", help="write only the solved board, not every step")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="look up the backtracking part of the search engine in this sqlite solution cache, "
+                             "shared with earlier runs and isomorphic puzzles")
+    profiling.add_profile_argument(parser, "the hot paths", "; batch workers are not counted")
+    args = parser.parse_args()
+
+    profiling.run_profiled(run, args, enable_profiling)
 
 if __name__ == "__main__":
     main()
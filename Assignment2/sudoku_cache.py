@@ -0,0 +1,265 @@
+import itertools
+import math
+import sqlite3
+from collections import OrderedDict, namedtuple
+
+# Puzzles whose invariants leave more row and column orders than this to try
+# are only cached up to digit relabelling, which keeps the lookup cheaper than a solve.
+MAX_CANDIDATES = 256
+
+# How a grid maps to its canonical form: the canonical square (i, j) is the
+# square (rows[i], cols[j]) of the grid, transposed first when transposed is
+# set, and digits[number] is the canonical number of every number.
+Transform = namedtuple("Transform", "transposed rows cols digits")
+
+def transpose(sudoku, size):
+    """
+    Swaps the rows and the columns of a flat Sudoku grid.
+    Parameters: bytearray Sudoku grid, int size.
+    Returns: bytearray Transposed grid.
+    """
+    return bytearray(sudoku[c * size + r] for r in range(size) for c in range(size))
+
+def get_line_keys(sudoku, size, box_size, frequencies):
+    """
+    Describes every row with values that no symmetry changes: its number of
+    clues, how often its numbers appear in the whole grid, and its clues per
+    submatrix column.
+    Parameters: bytearray Sudoku grid, int size, int box_size, list[int] frequencies: Count of every number.
+    Returns: list[tuple] Key of every row.
+    """
+    keys = []
+    for r in range(size):
+        row = sudoku[r * size:(r + 1) * size]
+        numbers = [number for number in row if number]
+        per_stack = sorted(sum(1 for number in row[s * box_size:(s + 1) * box_size] if number)
+                           for s in range(box_size))
+        keys.append((len(numbers), tuple(sorted(frequencies[number] for number in numbers)), tuple(per_stack)))
+    return keys
+
+def iterate_tied_orders(items, keys):
+    """
+    Sorts items by their keys and yields every order of the items with equal keys.
+    Parameters: list items, keys (list or dict): Key of every item.
+    Returns: generator of list Orders of the items.
+    """
+    groups = [list(group) for key, group in itertools.groupby(sorted(items, key=keys.__getitem__),
+                                                              key=keys.__getitem__)]
+    for orders in itertools.product(*(itertools.permutations(group) for group in groups)):
+        yield [item for order in orders for item in order]
+
+def count_tied_orders(items, keys):
+    """
+    Counts the orders iterate_tied_orders yields.
+    Parameters: list items, keys (list or dict): Key of every item.
+    Returns: int Number of orders.
+    """
+    count = 1
+    for key, group in itertools.groupby(sorted(items, key=keys.__getitem__), key=keys.__getitem__):
+        count *= math.factorial(len(list(group)))
+    return count
+
+def get_band_keys(keys, box_size):
+    """
+    Describes every band (box_size rows of submatrices) by the sorted keys of its rows.
+    Parameters: list[tuple] keys: Row keys from get_line_keys, int box_size.
+    Returns: list[tuple] Key of every band.
+    """
+    return [tuple(sorted(keys[b * box_size:(b + 1) * box_size])) for b in range(box_size)]
+
+def count_line_orders(keys, box_size):
+    """
+    Counts the row orders iterate_line_orders yields.
+    Parameters: list[tuple] keys: Row keys from get_line_keys, int box_size.
+    Returns: int Number of orders.
+    """
+    count = count_tied_orders(range(box_size), get_band_keys(keys, box_size))
+    for b in range(box_size):
+        count *= count_tied_orders(range(b * box_size, (b + 1) * box_size), keys)
+    return count
+
+def iterate_line_orders(keys, box_size):
+    """
+    Yields the row orders a symmetry can reach that sort the bands and the
+    rows inside every band by their keys.
+    Parameters: list[tuple] keys: Row keys from get_line_keys, int box_size.
+    Returns: generator of list[int] Row orders.
+    """
+    in_band = [list(iterate_tied_orders(range(b * box_size, (b + 1) * box_size), keys)) for b in range(box_size)]
+    for band_order in iterate_tied_orders(range(box_size), get_band_keys(keys, box_size)):
+        for rows in itertools.product(*(in_band[b] for b in band_order)):
+            yield [row for band in rows for row in band]
+
+def relabel(cells, size):
+    """
+    Renumbers the clues in the order they first appear.
+    Parameters: list[int] cells, int size.
+    Returns: tuple() bytes Renumbered cells and bytearray canonical number of every number.
+    """
+    digits = bytearray(size + 1)
+    label = 0
+    renumbered = bytearray(len(cells))
+    for i, number in enumerate(cells):
+        if number:
+            if not digits[number]:
+                label += 1
+                digits[number] = label
+            renumbered[i] = digits[number]
+    return bytes(renumbered), digits
+
+def complete_digits(digits, size):
+    """
+    Gives the numbers without a clue the canonical numbers left over, in order,
+    so the digit map is a permutation.
+    Parameters: bytearray digits: Canonical number of every clue number (0 for none), int size.
+    Returns: bytearray The completed digit map.
+    """
+    unused = iter(sorted(set(range(1, size + 1)) - set(digits)))
+    for number in range(1, size + 1):
+        if not digits[number]:
+            digits[number] = next(unused)
+    return digits
+
+def get_canonical_form(sudoku):
+    """
+    Maps a Sudoku to the same grid as every puzzle that differs from it only
+    by relabelled digits, rows or columns swapped inside their band, swapped
+    bands and transposition. Only orders that sort rows and columns by
+    symmetry-invariant keys are tried, and the smallest renumbered grid wins;
+    puzzles with more than MAX_CANDIDATES such orders keep their squares in
+    place and are only renumbered.
+    Parameters: bytearray Sudoku grid.
+    Returns: tuple() bytes Canonical grid (the cache key) and Transform.
+    """
+    size = int(round(len(sudoku) ** 0.5))
+    box_size = int(round(size ** 0.5))
+    frequencies = [sudoku.count(number) for number in range(size + 1)]
+
+    orientations = []
+    for transposed in (False, True):
+        grid = transpose(sudoku, size) if transposed else sudoku
+        row_keys = get_line_keys(grid, size, box_size, frequencies)
+        col_keys = get_line_keys(transpose(grid, size), size, box_size, frequencies)
+        signature = (sorted(get_band_keys(row_keys, box_size)), sorted(get_band_keys(col_keys, box_size)))
+        orientations.append((signature, transposed, grid, row_keys, col_keys))
+    best_signature = min(orientation[0] for orientation in orientations)
+    orientations = [orientation for orientation in orientations if orientation[0] == best_signature]
+
+    candidates = sum(count_line_orders(row_keys, box_size) * count_line_orders(col_keys, box_size)
+                     for signature, transposed, grid, row_keys, col_keys in orientations)
+    if candidates > MAX_CANDIDATES:
+        key, digits = relabel(sudoku, size)
+        return key, Transform(False, list(range(size)), list(range(size)), complete_digits(digits, size))
+
+    best = None
+    for signature, transposed, grid, row_keys, col_keys in orientations:
+        col_orders = list(iterate_line_orders(col_keys, box_size))
+        for rows in iterate_line_orders(row_keys, box_size):
+            row_starts = [row * size for row in rows]
+            for cols in col_orders:
+                key, digits = relabel([grid[start + col] for start in row_starts for col in cols], size)
+                if best is None or key < best[0]:
+                    best = key, Transform(transposed, rows, cols, digits)
+    key, transform = best
+    complete_digits(transform.digits, size)
+    return key, transform
+
+def to_canonical(sudoku, transform):
+    """
+    Moves a grid (a solution of the puzzle the transform was made for) to the canonical form.
+    Parameters: bytearray Sudoku grid, Transform.
+    Returns: bytes Canonical grid.
+    """
+    size = len(transform.rows)
+    grid = transpose(sudoku, size) if transform.transposed else sudoku
+    return bytes(transform.digits[grid[row * size + col]] for row in transform.rows for col in transform.cols)
+
+def from_canonical(canonical, transform):
+    """
+    Moves a canonical grid back to the squares and numbers of the puzzle the transform was made for.
+    Parameters: bytes Canonical grid, Transform.
+    Returns: bytearray Sudoku grid.
+    """
+    size = len(transform.rows)
+    numbers = bytearray(size + 1)
+    for number, label in enumerate(transform.digits):
+        numbers[label] = number
+    grid = bytearray(len(canonical))
+    for i, row in enumerate(transform.rows):
+        for j, col in enumerate(transform.cols):
+            grid[row * size + col] = numbers[canonical[i * size + j]]
+    return transpose(grid, size) if transform.transposed else grid
+
+class SolutionCache:
+    """
+    Solutions of Sudokus by canonical form, in an LRU dictionary in memory and,
+    when a path is given, in an sqlite database shared by runs and processes.
+    A puzzle with several solutions gets the one stored for its canonical
+    form, which may differ from the one the solver would find for it.
+    """
+
+    def __init__(self, path=None, capacity=4096):
+        """
+        Parameters: path (str or None): sqlite file, None to keep the cache in memory only,
+        capacity (int): Solutions kept in memory.
+        """
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.database = None
+        if path is not None:
+            self.database = sqlite3.connect(path, timeout=30)
+            self.database.execute("PRAGMA journal_mode=WAL")
+            self.database.execute("CREATE TABLE IF NOT EXISTS solutions (puzzle BLOB PRIMARY KEY, solution BLOB)")
+            self.database.commit()
+
+    def remember(self, key, canonical):
+        """
+        Puts a canonical solution (None for none) in memory, dropping the least recently used one when full.
+        Parameters: bytes key, bytes or None canonical.
+        Returns: None
+        """
+        self.memory[key] = canonical
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def solve(self, sudoku, solver):
+        """
+        Looks up the solution of a Sudoku, calling the solver only for puzzles
+        with no known isomorphic puzzle.
+        Parameters: bytearray Sudoku grid, solver (callable): Returns the solution
+        of a grid as a bytearray, or None when there is none.
+        Returns: bytearray Solution, or None if there is no solution.
+        """
+        key, transform = get_canonical_form(sudoku)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            canonical = self.memory[key]
+            self.hits += 1
+        else:
+            stored = None
+            if self.database is not None:
+                stored = self.database.execute("SELECT solution FROM solutions WHERE puzzle = ?", (key,)).fetchone()
+            if stored is not None:
+                canonical = stored[0]
+                self.hits += 1
+            else:
+                solution = solver(sudoku)
+                canonical = None if solution is None else to_canonical(solution, transform)
+                self.misses += 1
+                if self.database is not None:
+                    self.database.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)", (key, canonical))
+                    self.database.commit()
+            self.remember(key, canonical)
+        return None if canonical is None else from_canonical(canonical, transform)
+
+    def close(self):
+        """
+        Closes the database.
+        Returns: None
+        """
+        if self.database is not None:
+            self.database.close()
+            self.database = None
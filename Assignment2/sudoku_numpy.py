@@ -0,0 +1,142 @@
+import numpy as np
+
+import sudoku as scalar
+
+def lines_to_puzzles(lines):
+    """
+    Converts one-line Sudokus of the same size to a puzzle array.
+    Parameters: lines (list[str]): One-line Sudokus (see sudoku.parse_sudoku_line).
+    Returns: numpy.ndarray (N, size, size) uint8 array of the puzzles.
+    """
+    grids = [scalar.parse_sudoku_line(line) for line in lines]
+    if len(set(map(len, grids))) != 1:
+        raise ValueError("Every puzzle of a block must have the same size.")
+    size = scalar.get_sizes(grids[0])[0]
+    puzzles = np.frombuffer(b"".join(grids), dtype=np.uint8)
+    return puzzles.reshape(-1, size, size)
+
+def puzzles_to_candidates(puzzles):
+    """
+    Builds the candidate tensor of a puzzle array.
+    Parameters: numpy.ndarray (N, size, size) puzzles, 0 for empty squares.
+    Returns: numpy.ndarray (N, size, size, size) bool tensor, [n, row, col, number - 1]
+    is True when the number is still possible for the square.
+    """
+    size = puzzles.shape[-1]
+    candidates = np.ones(puzzles.shape + (size,), dtype=bool)
+    filled = puzzles > 0
+    candidates[filled] = np.arange(1, size + 1) == puzzles[filled][:, None]
+    return candidates
+
+def box_any(tensor):
+    """
+    Reduces a (N, size, size, size) tensor over every submatrix and spreads the
+    result back over the squares of that submatrix.
+    Parameters: numpy.ndarray (N, size, size, size) bool tensor.
+    Returns: numpy.ndarray (N, size, size, size) bool tensor.
+    """
+    size = tensor.shape[-1]
+    box_size = scalar.get_layout(size).box_size
+    shape = (len(tensor), box_size, box_size, box_size, box_size, size)
+    boxes = tensor.reshape(shape).any(axis=(2, 4))
+    return np.broadcast_to(boxes[:, :, None, :, None, :], shape).reshape(tensor.shape)
+
+def box_count(tensor):
+    """
+    Counts a (N, size, size, size) tensor over every submatrix and spreads the
+    result back over the squares of that submatrix.
+    Parameters: numpy.ndarray (N, size, size, size) bool tensor.
+    Returns: numpy.ndarray (N, size, size, size) uint8 tensor.
+    """
+    size = tensor.shape[-1]
+    box_size = scalar.get_layout(size).box_size
+    shape = (len(tensor), box_size, box_size, box_size, box_size, size)
+    boxes = tensor.reshape(shape).sum(axis=(2, 4), dtype=np.uint8)
+    return np.broadcast_to(boxes[:, :, None, :, None, :], shape).reshape(tensor.shape)
+
+def propagate_candidates(candidates):
+    """
+    Eliminates naked and hidden singles for every puzzle at once until nothing
+    changes any more. Puzzles that stop changing leave the working set, so
+    later rounds only touch the ones still making progress. Works in place.
+    Parameters: numpy.ndarray (N, size, size, size) bool candidate tensor.
+    Returns: numpy.ndarray (N, size, size, size) bool candidate tensor.
+    """
+    active = np.arange(len(candidates))
+    while len(active):
+        working = candidates[active]
+        before = working.copy()
+
+        # Naked singles: a placed number is removed from its row, column and submatrix.
+        placed = working & (working.sum(axis=3, keepdims=True, dtype=np.uint8) == 1)
+        taken = (placed.any(axis=2, keepdims=True)
+                 | placed.any(axis=1, keepdims=True)
+                 | box_any(placed))
+        working &= ~taken | placed
+
+        # Hidden singles: a number with one place left in a unit goes there.
+        hidden = working & ((working.sum(axis=2, keepdims=True, dtype=np.uint8) == 1)
+                            | (working.sum(axis=1, keepdims=True, dtype=np.uint8) == 1)
+                            | (box_count(working) == 1))
+        has_hidden = hidden.any(axis=3, keepdims=True)
+        working = np.where(has_hidden, hidden, working)
+
+        candidates[active] = working
+        changed = (working != before).any(axis=(1, 2, 3))
+        active = active[changed]
+    return candidates
+
+def solve_puzzles(puzzles, engine="search"):
+    """
+    Solves a puzzle array with vectorized propagation. Puzzles the propagation
+    cannot finish are handed to the scalar solver of sudoku.py.
+    Parameters: numpy.ndarray (N, size, size) puzzles, engine (str): Scalar engine for the leftovers.
+    Returns: list Solved (size, size) arrays, or None for puzzles without a solution.
+    """
+    candidates = propagate_candidates(puzzles_to_candidates(puzzles))
+    counts = candidates.sum(axis=3, dtype=np.uint8)
+    solved = (counts == 1).all(axis=(1, 2))
+    # Every number exactly once per unit also catches repeated clues.
+    units_complete = ((candidates.sum(axis=2) == 1).all(axis=(1, 2))
+                      & (candidates.sum(axis=1) == 1).all(axis=(1, 2))
+                      & (box_count(candidates) == 1).all(axis=(1, 2, 3)))
+    broken = (counts == 0).any(axis=(1, 2)) | (solved & ~units_complete)
+    grids = np.where(counts == 1, candidates.argmax(axis=3) + 1, 0)
+
+    solutions = []
+    for i in range(len(puzzles)):
+        if broken[i]:
+            solutions.append(None)
+        elif solved[i]:
+            solutions.append(grids[i])
+        else:
+            sudoku = bytearray(grids[i].astype(np.uint8).tobytes())
+            try:
+                for step in scalar.ENGINES[engine](sudoku, scalar.count_zeros(sudoku)):
+                    pass
+            except ValueError:
+                solutions.append(None)
+                continue
+            solutions.append(np.frombuffer(sudoku, dtype=np.uint8).reshape(grids[i].shape))
+    return solutions
+
+def solve_lines(lines, engine="search"):
+    """
+    Solves a block of one-line Sudokus. Runs inside the batch worker processes.
+    Parameters: lines (list[str]): One-line Sudokus, engine (str): Scalar engine for the leftovers.
+    Returns: list[str] One-line solutions in input order, or the error for
+    puzzles that cannot be read or solved.
+    """
+    try:
+        puzzles = lines_to_puzzles(lines)
+    except ValueError:
+        # Fall back to one puzzle at a time so only the broken lines fail.
+        return [scalar.solve_batch_puzzle(("line", "", line), engine)[1] for line in lines]
+
+    outputs = []
+    for solution in solve_puzzles(puzzles, engine):
+        if solution is None:
+            outputs.append("Sudoku has no solution.")
+        else:
+            outputs.append(scalar.sudoku_to_line(bytearray(solution.astype(np.uint8).tobytes())))
+    return outputs
@@ -1,25 +1,107 @@
+import argparse
+import multiprocessing
+import os
+import random
 import sys
+import time
+from array import array
+from collections import OrderedDict
 
-input_file_name = sys.argv[1]
+if __name__ == "__main__":
+    # Run as a script: the bbm103 package of helpers shared by the assignments
+    # is in the repository root, which is not on the module search path yet.
+    # Importers put it there themselves, so importing changes nothing.
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def solve_board_file(file_board): 
+from bbm103 import corpus, profiling
+
+def parse_board(content):
     """
-    Reads the content of the specified file and converts it into a list (board).
+    Converts the text of a board, one row per line, into a list (board).
 
     Parameters:
-    - file_board (str): The name of the input file.
+    - content (str): Numbers of every row separated by spaces.
 
     Returns:
     - list: representing the game board.
     """
     board = []
-    with open(file_board, "r") as file:
-        content = file.read()
-        for row in content.strip().split('\n'):
-            row_values = list(map(int, row.split()))
-            board.append(row_values)
+    for row in content.strip().split('\n'):
+        row_values = list(map(int, row.split()))
+        board.append(row_values)
     return board
 
+def parse_board_record(lines):
+    """
+    Converts the rows of a corpus record into a list (board). Rows of one-digit
+    numbers separated by single spaces are decoded with bytes.translate (see
+    corpus.decode_digit_row); other rows are split into numbers.
+
+    Parameters:
+    - lines (list): Rows of space separated numbers, as bytes.
+
+    Returns:
+    - list: representing the game board.
+    """
+    board = []
+    for line in lines:
+        row = corpus.decode_digit_row(line)
+        if row is not None:
+            board.append(list(row))
+        else:
+            board.append(list(map(int, line.split())))
+    return board
+
+def iterate_boards(path):
+    """
+    Streams the boards of a corpus file holding boards separated by empty lines.
+
+    Parameters:
+    - path (str): The name of the corpus file.
+
+    Returns:
+    - generator: Every board (list).
+    """
+    for lines in corpus.iterate_corpus_records(path):
+        yield parse_board_record(lines)
+
+def load_board(file_board):
+    """
+    Reads the board of the specified file into a list (board) with the
+    streaming reader of iterate_boards; a file of several boards separated by
+    empty lines gives its first board.
+
+    Parameters:
+    - file_board (str): The name of the input file.
+
+    Returns:
+    - list: representing the game board.
+
+    Raises:
+    - ValueError: If the file holds no board.
+    """
+    for board in iterate_boards(file_board):
+        return board
+    raise ValueError("{} holds no board.".format(file_board))
+
+def solve_board_file(file_board):
+    """
+    Same as load_board, kept for older callers.
+    """
+    return load_board(file_board)
+
+def score_to_str(score):
+    """
+    Converts the score to the lines printed under the board.
+
+    Parameters:
+    - score (int): Current score.
+
+    Returns:
+    - str: The score lines.
+    """
+    return "\nYour score is: {} \n\n".format(score)
+
 def print_current_board(board, score):
     """
     Prints the current state of the game board along with the score.
@@ -82,7 +164,6 @@ def find_set_of_connected_numbers(board, row_to_pop, col_to_pop):
     Returns:
     - tuple: A set of coordinates of connected numbers and the selected number.
     """
-    numbers_coordinates = set()
     selected_number = board[row_to_pop][col_to_pop]
     row_count = len(board)
     col_count = len(board[0])
@@ -90,22 +171,31 @@ def find_set_of_connected_numbers(board, row_to_pop, col_to_pop):
     if selected_number == -1 or selected_number == ' ':
         return set(), -1
 
-    def dfs(row, col):
-        if not (0 <= row < row_count) or not (0 <= col < col_count):
-            return
-        
-        if board[row][col] != selected_number:
-            return
-
-        if (row,col) in numbers_coordinates:
-            return
-        numbers_coordinates.add((row,col))
-        dfs(row-1,col)
-        dfs(row+1, col)
-        dfs(row, col+1)
-        dfs(row, col-1)
+    # Flood fill with an explicit stack; cells are numbered row * col_count + col
+    # and marked in a flat visited mask, so large regions do not hit the recursion limit.
+    visited = bytearray(row_count * col_count)
+    start = row_to_pop * col_count + col_to_pop
+    visited[start] = 1
+    stack = [start]
+    found = []
+    while stack:
+        cell = stack.pop()
+        found.append(cell)
+        row, col = divmod(cell, col_count)
+        if row > 0 and not visited[cell - col_count] and board[row - 1][col] == selected_number:
+            visited[cell - col_count] = 1
+            stack.append(cell - col_count)
+        if row < row_count - 1 and not visited[cell + col_count] and board[row + 1][col] == selected_number:
+            visited[cell + col_count] = 1
+            stack.append(cell + col_count)
+        if col < col_count - 1 and not visited[cell + 1] and board[row][col + 1] == selected_number:
+            visited[cell + 1] = 1
+            stack.append(cell + 1)
+        if col > 0 and not visited[cell - 1] and board[row][col - 1] == selected_number:
+            visited[cell - 1] = 1
+            stack.append(cell - 1)
 
-    dfs(row_to_pop, col_to_pop)
+    numbers_coordinates = {divmod(cell, col_count) for cell in found}
     return numbers_coordinates, selected_number
 
 def remove_cells(board, numbers_coordinates):
@@ -201,16 +291,7 @@ def board_list_to_str(board):
     Returns:
     - str: String representation of the game board.
     """
-    string_board = ""
-
-    for row in board:
-        temp_list = []
-        for number in row:
-            temp_list.append(str(number))
-        string_row = " ".join(temp_list)
-        string_board += string_row + "\n"
-
-    return string_board
+    return "".join(" ".join(map(str, row)) + "\n" for row in board)
 
 def get_input_rowcol():  
     """
@@ -231,55 +312,863 @@ def get_input_rowcol():
         return None, None
 
 
-def is_game_over(board):
+def count_column_pairs(board, col):
+    """
+    Counts the pairs of neighbouring cells holding the same number that belong
+    to a column: the pairs inside the column and the pairs with the column on its right.
+
+    Parameters:
+    - board (list): representing the game board.
+    - col (int): Column index to count.
+
+    Returns:
+    - int: Number of equal pairs of the column.
+    """
+    pairs = 0
+    last_col = col == len(board[0]) - 1
+    for row in range(len(board)):
+        number = board[row][col]
+        if number == -1 or number == ' ':
+            continue
+        if row > 0 and board[row - 1][col] == number:
+            pairs += 1
+        if not last_col and board[row][col + 1] == number:
+            pairs += 1
+    return pairs
+
+def build_pair_counts(board):
+    """
+    Counts the equal pairs of every column (see count_column_pairs).
+
+    Parameters:
+    - board (list): representing the game board.
+
+    Returns:
+    - list: Number of equal pairs of each column.
+    """
+    return [count_column_pairs(board, col) for col in range(len(board[0]))]
+
+def update_pair_counts(board, pair_counts, columns):
+    """
+    Recounts the equal pairs of the given columns and of the columns on their
+    left, whose pairs with them may have changed too.
+
+    Parameters:
+    - board (list): representing the game board.
+    - pair_counts (list): Pair counts built by build_pair_counts, updated in place.
+    - columns (iterable): Indices of the columns that changed.
+
+    Returns:
+    - None
+    """
+    to_update = set()
+    for col in columns:
+        to_update.add(col)
+        if col > 0:
+            to_update.add(col - 1)
+    for col in to_update:
+        pair_counts[col] = count_column_pairs(board, col)
+
+def is_game_over(board, pair_counts=None):
+    """
+    Checks if no more numbers can be popped. A set of connected numbers has
+    more than one cell exactly when two neighbouring cells hold the same
+    number, so the game is over when no column has such a pair.
+
+    Parameters:
+    - board (list): representing the game board, or its compact columns
+    when pair_counts is given.
+    - pair_counts (list): Pair counts kept up to date with update_pair_counts
+    or pop_columns; they are counted from the board when not given.
+
+    Returns:
+    - bool: True if the game is over, False otherwise.
+    """
+    if pair_counts is None:
+        pair_counts = build_pair_counts(board)
+    return not any(pair_counts)
+
+
+# Empty cell kept under the numbers of a compact column. The game moves a row
+# left empty by a pop to the bottom, and its cells then hold up the numbers
+# above them like any other cell.
+BLANK = -1
+# Type code of the compact column arrays: C ints, which hold any number a
+# board is likely to have; board_to_columns rejects the others.
+COLUMN_TYPE = 'i'
+
+def board_to_columns(board):
+    """
+    Converts the board to compact columns: every column is an array of its
+    cells from the bottom up, without the empty cells above its top number.
+    Empty cells under a number are kept as BLANK, since they hold the numbers
+    above them up (see shift_row_to_bottom).
+
+    Parameters:
+    - board (list): representing the game board.
+
+    Returns:
+    - list: Columns of the board as array(COLUMN_TYPE) stacks, one for every column.
+
+    Raises:
+    - ValueError: If a number does not fit in a COLUMN_TYPE array.
+    """
+    columns = []
+    for col in range(len(board[0])):
+        try:
+            column = array(COLUMN_TYPE, [BLANK if is_empty_cell(board, row, col) else board[row][col]
+                                         for row in range(len(board) - 1, -1, -1)])
+        except OverflowError:
+            limit = 1 << (array(COLUMN_TYPE).itemsize * 8 - 1)
+            raise ValueError("Column {} holds a number outside the {} to {} range of the game.".format(
+                col + 1, -limit, limit - 1))
+        while column and column[-1] == BLANK:
+            column.pop()
+        columns.append(column)
+    return columns
+
+def columns_to_board(columns, row_count, col_count):
+    """
+    Converts compact columns back to a board, filling the cells above the
+    columns and the BLANK cells with spaces.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+    - row_count (int): Number of rows of the board.
+    - col_count (int): Number of columns of the board.
+
+    Returns:
+    - list: representing the game board.
+    """
+    board = [[' '] * col_count for _ in range(row_count)]
+    for col, column in enumerate(columns):
+        for level, number in enumerate(column):
+            if number != BLANK:
+                board[row_count - 1 - level][col] = number
+    return board
+
+def find_set_of_connected_numbers_in_columns(columns, col, level, visited=None):
+    """
+    Finds a set of connected numbers on the compact columns starting from the specified cell.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+    - col (int): Column index to start the search.
+    - level (int): Height of the cell in its column, 0 for the bottom cell.
+    - visited (bytearray): Visited mask of the cells, numbered col * height + level
+    with height the height of the tallest column; find_groups shares one between
+    its calls. None for a new mask.
+
+    Returns:
+    - tuple: A set of (column, level) coordinates of connected numbers and the selected number.
+    """
+    selected_number = columns[col][level]
+    col_count = len(columns)
+    height = max(map(len, columns))
+    if visited is None:
+        visited = bytearray(col_count * height)
+
+    # Same flood fill as find_set_of_connected_numbers, on cells numbered col * height + level.
+    start = col * height + level
+    visited[start] = 1
+    stack = [start]
+    found = []
+    while stack:
+        cell = stack.pop()
+        found.append(cell)
+        col, level = divmod(cell, height)
+        column = columns[col]
+        if level + 1 < len(column) and not visited[cell + 1] and column[level + 1] == selected_number:
+            visited[cell + 1] = 1
+            stack.append(cell + 1)
+        if level > 0 and not visited[cell - 1] and column[level - 1] == selected_number:
+            visited[cell - 1] = 1
+            stack.append(cell - 1)
+        if (col + 1 < col_count and level < len(columns[col + 1]) and not visited[cell + height] and
+                columns[col + 1][level] == selected_number):
+            visited[cell + height] = 1
+            stack.append(cell + height)
+        if (col > 0 and level < len(columns[col - 1]) and not visited[cell - height] and
+                columns[col - 1][level] == selected_number):
+            visited[cell - height] = 1
+            stack.append(cell - height)
+
+    numbers_coordinates = {divmod(cell, height) for cell in found}
+    return numbers_coordinates, selected_number
+
+def count_columns_pairs(columns, col):
+    """
+    Counts the equal pairs of a compact column (see count_column_pairs).
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+    - col (int): Column index to count.
+
+    Returns:
+    - int: Number of equal pairs of the column.
+    """
+    column = columns[col]
+    pairs = sum(1 for level in range(1, len(column)) if column[level] == column[level - 1] != BLANK)
+    if col + 1 < len(columns):
+        pairs += sum(1 for number, right in zip(column, columns[col + 1]) if number == right != BLANK)
+    return pairs
+
+def pop_columns(columns, numbers_coordinates, pair_counts, row_count, col, level):
+    """
+    Removes the popped cells from the compact columns with the rules of
+    remove_cells, gravite_numbers, shift_row_to_bottom and shift_left_col.
+    Only the columns the cells were in are rebuilt, which lets the cells above
+    fall. If every column lost more cells than there are rows above the
+    clicked cell, the clicked row is left empty after the fall and moves to
+    the bottom, so every column gets a BLANK cell under it. Then, if the
+    clicked column is left empty, it is deleted and an empty column is added
+    on the right, so the columns after it move left.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns, updated in place.
+    - numbers_coordinates (set): (column, level) coordinates to be removed.
+    - pair_counts (list): Pair counts of the columns, updated in place.
+    - row_count (int): Number of rows of the board.
+    - col (int): Column index of the clicked cell.
+    - level (int): Level of the clicked cell.
+
+    Returns:
+    - tuple: The lowest level that changed and the level above the highest
+    one; rows outside these levels look the same as before the pop.
+    """
+    popped_levels = {}
+    for cell_col, cell_level in numbers_coordinates:
+        popped_levels.setdefault(cell_col, set()).add(cell_level)
+
+    lowest = min(cell_level for cell_col, cell_level in numbers_coordinates)
+    highest = max(len(columns[cell_col]) for cell_col in popped_levels)
+    for cell_col, levels in popped_levels.items():
+        column = array(COLUMN_TYPE, [number for cell_level, number in enumerate(columns[cell_col])
+                                     if cell_level not in levels])
+        # BLANK cells left on top are plain empty cells.
+        while column and column[-1] == BLANK:
+            column.pop()
+        columns[cell_col] = column
+    # A column's pairs change with it and with the column on its right.
+    changed_cols = set()
+    for cell_col in popped_levels:
+        changed_cols.update([cell_col, cell_col - 1])
+
+    if len(popped_levels) == len(columns) and min(map(len, popped_levels.values())) >= row_count - level:
+        for index, column in enumerate(columns):
+            if column:
+                columns[index] = array(COLUMN_TYPE, [BLANK]) + column
+        lowest, highest = 0, row_count
+        changed_cols = set(range(len(columns)))
+
+    if not columns[col]:
+        del columns[col]
+        columns.append(array(COLUMN_TYPE))
+        del pair_counts[col]
+        pair_counts.append(0)
+        # Every column after the clicked one moved left, from the bottom up.
+        lowest = 0
+        highest = max([highest] + [len(column) for column in columns[col:]])
+        changed_cols = {cell_col - 1 if cell_col > col else cell_col for cell_col in changed_cols if cell_col != col}
+
+    for cell_col in changed_cols:
+        if 0 <= cell_col < len(columns):
+            pair_counts[cell_col] = count_columns_pairs(columns, cell_col)
+    return lowest, highest
+
+def make_move(columns, pair_counts, row_count, col_count, row, col, changed_levels=None):
+    """
+    Pops the set of connected numbers at the given cell, if there is one.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns, updated in place.
+    - pair_counts (list): Pair counts of the columns, updated in place.
+    - row_count (int): Number of rows of the board.
+    - col_count (int): Number of columns of the board.
+    - row (int): Row index of the cell, None for unreadable input.
+    - col (int): Column index of the cell.
+    - changed_levels (list): If given, gets the levels a pop changed (see
+    pop_columns) in place of its old contents.
+
+    Returns:
+    - tuple: The result ("popped", "no movement", "empty" or "invalid") and the points gained.
+    """
+    if row is None or not (0 <= row < row_count and 0 <= col < col_count):
+        return "invalid", 0
+    level = row_count - 1 - row
+    if level >= len(columns[col]) or columns[col][level] == BLANK:
+        return "empty", 0
+
+    numbers_will_pop, selected = find_set_of_connected_numbers_in_columns(columns, col, level)
+    if len(numbers_will_pop) == 1:
+        return "no movement", 0
+    levels = pop_columns(columns, numbers_will_pop, pair_counts, row_count, col, level)
+    if changed_levels is not None:
+        changed_levels[:] = levels
+    return "popped", selected * len(numbers_will_pop)
+
+def pop(board, row, col):
+    """
+    Pops the set of connected numbers at the given cell without changing the
+    board, with the rules of play_game. Empty cells under numbers stay where
+    they are, as in the game.
+
+    Parameters:
+    - board (list): representing the game board, -1 or ' ' for empty cells.
+    - row (int): Row coordinate of the cell.
+    - col (int): Column coordinate of the cell.
+
+    Returns:
+    - tuple: The new board (' ' for empty cells) and the points gained, 0 when
+    the cell has no equal neighbour and nothing pops.
+
+    Raises:
+    - ValueError: If the cell is outside the board or empty.
+    """
     row_count = len(board)
     col_count = len(board[0])
+    columns = board_to_columns(board)
+    pair_counts = [count_columns_pairs(columns, index) for index in range(len(columns))]
+    result, points = make_move(columns, pair_counts, row_count, col_count, row, col)
+    if result == "invalid":
+        raise ValueError("Cell ({}, {}) is outside the board.".format(row, col))
+    if result == "empty":
+        raise ValueError("Cell ({}, {}) is empty.".format(row, col))
+    return columns_to_board(columns, row_count, col_count), points
+
+def columns_row_to_str(columns, level, col_count):
+    """
+    Converts one row of the compact columns to the text board_list_to_str writes for it.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+    - level (int): Height of the row, 0 for the bottom row.
+    - col_count (int): Number of columns of the board.
 
-    for row in range(row_count):
-        for col in range(col_count):
-            to_be_popped_set, value = find_set_of_connected_numbers(board, row, col)
-            if len(to_be_popped_set) > 1:
-                return False
-            
-    return True
+    Returns:
+    - str: The row without its line break.
+    """
+    cells = [str(column[level]) if level < len(column) and column[level] != BLANK else ' ' for column in columns]
+    return " ".join(cells + [' '] * (col_count - len(columns)))
+
+RENDER_MODES = ["full", "ansi", "delta"]
+
+class BoardRenderer:
+    """
+    Writes the board of a game after every move. "full" prints the whole
+    board as print_current_board does. "ansi" draws the board once at the top
+    of the screen and then rewrites only the rows a move changed, in place;
+    boards taller than the terminal scroll away and are not redrawn right.
+    "delta" writes the board once and then a "row: text" line for every
+    changed row (rows numbered from 1) and a "score: points" line, a compact
+    log that can be replayed to rebuild every board.
+    """
+
+    def __init__(self, mode="full"):
+        """
+        Parameters:
+        - mode (str): One of RENDER_MODES.
+        """
+        if mode not in RENDER_MODES:
+            raise ValueError("Unknown render mode {!r}, expected one of {}.".format(mode, ", ".join(RENDER_MODES)))
+        self.mode = mode
+        self.rows = []
+        self.col_count = 0
+
+    def reset(self, board):
+        """
+        Remembers the text of every row of a board as the one on the screen.
+
+        Parameters:
+        - board (list): representing the game board.
+
+        Returns:
+        - None
+        """
+        self.rows = [" ".join(map(str, row)) for row in board]
+        self.col_count = len(board[0])
+
+    def draw(self, board, score):
+        """
+        Writes the whole board.
+
+        Parameters:
+        - board (list): representing the game board.
+        - score (int): Current score.
+
+        Returns:
+        - None
+        """
+        self.reset(board)
+        if self.mode == "ansi":
+            sys.stdout.write("\x1b[H\x1b[2J")
+        if self.mode == "delta":
+            sys.stdout.write(board_list_to_str(board) + "score: {}\n".format(score))
+        else:
+            sys.stdout.write(board_list_to_str(board) + score_to_str(score))
+        sys.stdout.flush()
 
+    def update(self, columns, score, changed_levels=None, after_pop=False):
+        """
+        Writes the board after a move.
 
-def play_game(board, puan):
-    while True:
-        
-        if is_game_over(board):
-            print("Game over.\n")
+        Parameters:
+        - columns (list): Columns built by board_to_columns.
+        - score (int): Current score.
+        - changed_levels (tuple): Levels the move changed (see pop_columns), None if nothing changed.
+        - after_pop (bool): The move popped a set; the full board then follows an empty line.
+
+        Returns:
+        - None
+        """
+        row_count = len(self.rows)
+        if self.mode == "full":
+            board = columns_to_board(columns, row_count, self.col_count)
+            sys.stdout.write(("\n" if after_pop else "") + board_list_to_str(board) + score_to_str(score))
             return
 
-        row, col = get_input_rowcol()
+        output = []
+        if changed_levels is not None:
+            lowest, highest = changed_levels
+            for row in range(row_count - highest, row_count - lowest):
+                text = columns_row_to_str(columns, row_count - 1 - row, self.col_count)
+                if text == self.rows[row]:
+                    continue
+                self.rows[row] = text
+                if self.mode == "ansi":
+                    output.append("\x1b[{};1H\x1b[2K{}".format(row + 1, text))
+                else:
+                    output.append("{}: {}\n".format(row + 1, text))
+        if self.mode == "ansi":
+            output.append("\x1b[{};1H\x1b[J".format(row_count + 1) + score_to_str(score))
+        else:
+            output.append("score: {}\n".format(score))
+        sys.stdout.write("".join(output))
+        sys.stdout.flush()
+
+    def message(self, text):
+        """
+        Writes a message under the board; in "ansi" mode it replaces the
+        messages and input lines left there since the last move.
+
+        Parameters:
+        - text (str): The message.
+
+        Returns:
+        - None
+        """
+        if self.mode == "ansi":
+            text = "\x1b[{};1H\x1b[J".format(len(self.rows) + 4) + text
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+def play_game(board, puan, renderer=None):
+    """
+    Plays the game with moves entered by the user until no numbers can be popped.
+
+    Parameters:
+    - board (list): representing the game board.
+    - puan (int): Starting score.
+    - renderer (BoardRenderer): Writes the board after every move, one in
+    "full" mode when not given. Its draw method should have written the starting board.
 
-        if not is_valid_coordinate(board, row, col):
-            print("\nPlease enter a correct size!\n")
-            return play_game(board, puan)
+    Returns:
+    - int: Final score.
+    """
+    if renderer is None:
+        renderer = BoardRenderer()
+        renderer.reset(board)
+    row_count = len(board)
+    col_count = len(board[0])
+    columns = board_to_columns(board)
+    pair_counts = [count_columns_pairs(columns, col) for col in range(len(columns))]
+    changed_levels = []
 
-        elif is_empty_cell(board, row, col):
-            print("\nEmpty cell, try again!\n")
-            return play_game(board, puan)
+    while not is_game_over(columns, pair_counts):
+        row, col = get_input_rowcol()
+        result, points = make_move(columns, pair_counts, row_count, col_count, row, col, changed_levels)
 
+        if result == "invalid":
+            renderer.message("\nPlease enter a correct size!\n\n")
+        elif result == "empty":
+            renderer.message("\nEmpty cell, try again!\n\n")
+        elif result == "no movement":
+            renderer.message("\nNo movement happened try again\n\n")
+            renderer.update(columns, puan)
         else:
-            numbers_will_pop, selected = find_set_of_connected_numbers(board, row, col)
-
-            if len(numbers_will_pop) == 1:
-                print("\nNo movement happened try again\n")
-                print_current_board(board, puan)
-                return play_game(board, puan)
-
-            removed_count = len(remove_cells(board, numbers_will_pop))
-            
-            puan += selected * len(numbers_will_pop)
-            print()
-
-            gravite_numbers(board)
-            shift_row_to_bottom(board, row)
-            replace_minus_one_with_space(board)
-            shift_left_col(board, col)
-            print_current_board(board, puan)
-
-board = solve_board_file(input_file_name)
-print_current_board(board, 0)
-play_game(board, 0)              
+            puan += points
+            renderer.update(columns, puan, changed_levels, after_pop=True)
+
+    renderer.message("Game over.\n\n")
+    return puan
+
+def make_zobrist_table(row_count, col_count, max_number, seed=103):
+    """
+    Draws the random keys used to hash positions: one for every number on
+    every cell, and a last one for a BLANK cell, which table[col][level][BLANK] picks.
+
+    Parameters:
+    - row_count (int): Number of rows of the board.
+    - col_count (int): Number of columns of the board.
+    - max_number (int): Largest number on the board.
+    - seed (int): Seed of the random keys.
+
+    Returns:
+    - list: table[col][level][number] - the 64-bit key of number on that cell.
+    """
+    generator = random.Random(seed)
+    return [[[generator.getrandbits(64) for _ in range(max_number + 2)] for _ in range(row_count)]
+            for _ in range(col_count)]
+
+def zobrist_key(columns, table):
+    """
+    Hashes a position as the XOR of the keys of its numbers, so positions
+    reached by different orders of moves get the same key.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+    - table (list): Keys drawn by make_zobrist_table.
+
+    Returns:
+    - int: The key of the position.
+    """
+    key = 0
+    for col, column in enumerate(columns):
+        column_table = table[col]
+        for level, number in enumerate(column):
+            key ^= column_table[level][number]
+    return key
+
+def find_groups(columns):
+    """
+    Finds every set of connected numbers that can be popped.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+
+    Returns:
+    - list: (coordinates, number) of every set with more than one cell.
+    """
+    groups = []
+    height = max(map(len, columns), default=0)
+    # One visited mask for every flood fill, so each cell is visited once.
+    visited = bytearray(len(columns) * height)
+    for col, column in enumerate(columns):
+        for level in range(len(column)):
+            if visited[col * height + level] or column[level] == BLANK:
+                continue
+            numbers_coordinates, selected = find_set_of_connected_numbers_in_columns(columns, col, level, visited)
+            if len(numbers_coordinates) > 1:
+                groups.append((numbers_coordinates, selected))
+    return groups
+
+def poppable_points(columns):
+    """
+    Adds up the numbers of the cells that have a neighbour with the same
+    number: the points the sets of the position are worth if popped as they are.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns.
+
+    Returns:
+    - int: Sum of the numbers of the cells that can be popped.
+    """
+    points = 0
+    for col, column in enumerate(columns):
+        left = columns[col - 1] if col > 0 else ()
+        right = columns[col + 1] if col + 1 < len(columns) else ()
+        for level, number in enumerate(column):
+            if number == BLANK:
+                continue
+            if ((level > 0 and column[level - 1] == number) or
+                    (level + 1 < len(column) and column[level + 1] == number) or
+                    (level < len(left) and left[level] == number) or
+                    (level < len(right) and right[level] == number)):
+                points += number
+    return points
+
+def finish_greedily(columns, pair_counts, score, moves, row_count, deadline):
+    """
+    Plays the set worth the most points until the game is over.
+
+    Parameters:
+    - columns (list): Columns built by board_to_columns; they are not changed.
+    - pair_counts (list): Pair counts of the columns; they are not changed.
+    - score (int): Score before the moves.
+    - moves (list): Moves played so far.
+    - row_count (int): Number of rows of the board.
+    - deadline (float): time.perf_counter() value to stop at.
+
+    Returns:
+    - tuple: The final score and all the moves.
+    """
+    columns, pair_counts, moves = list(columns), list(pair_counts), list(moves)
+    while any(pair_counts) and time.perf_counter() < deadline:
+        numbers_coordinates, selected = max(find_groups(columns), key=lambda group: group[1] * len(group[0]))
+        col, level = min(numbers_coordinates, key=lambda cell: (-cell[1], cell[0]))
+        moves.append((row_count - level, col + 1))
+        score += selected * len(numbers_coordinates)
+        pop_columns(columns, numbers_coordinates, pair_counts, row_count, col, level)
+    return score, moves
+
+def search_best_moves(board, beam_width=16, time_limit=10.0, table_size=200000):
+    """
+    Searches for the move sequence with the highest score with a beam search.
+    Every round plays every possible move of the positions in the beam and
+    keeps the beam_width best results, ranked by their score plus the points
+    still on the board in sets (poppable_points). Positions are looked up by
+    their Zobrist key in a transposition table, so a position reached again by
+    a different order of moves is only kept if it scores more; the table
+    forgets the least recently used positions when it grows past table_size.
+    When the time is nearly up, the positions left in the beam are finished
+    greedily, so the result is always a complete game.
+
+    Parameters:
+    - board (list): representing the game board.
+    - beam_width (int): Number of positions kept every round.
+    - time_limit (float): Seconds the search may take.
+    - table_size (int): Number of positions the transposition table remembers.
+
+    Returns:
+    - tuple: The best score and its moves as (row, column) numbers starting from 1.
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit
+    beam_deadline = start + time_limit * 0.8  # The rest is for finishing the beam
+    row_count = len(board)
+    col_count = len(board[0])
+    columns = board_to_columns(board)
+    pair_counts = [count_columns_pairs(columns, col) for col in range(len(columns))]
+    table = make_zobrist_table(row_count, col_count, max((number for column in columns for number in column), default=0))
+    seen = OrderedDict()
+
+    best_score, best_moves = finish_greedily(columns, pair_counts, 0, [], row_count, deadline)
+    beam = [(0, columns, pair_counts, [])]
+    while beam and time.perf_counter() < beam_deadline:
+        children = []
+        for score, columns, pair_counts, moves in beam:
+            if time.perf_counter() >= beam_deadline:
+                break
+            if not any(pair_counts):
+                if score > best_score:
+                    best_score, best_moves = score, moves
+                continue
+            for numbers_coordinates, selected in find_groups(columns):
+                # The move clicks the top left cell of the set.
+                col, level = min(numbers_coordinates, key=lambda cell: (-cell[1], cell[0]))
+                child_columns, child_pair_counts = list(columns), list(pair_counts)
+                pop_columns(child_columns, numbers_coordinates, child_pair_counts, row_count, col, level)
+                child_score = score + selected * len(numbers_coordinates)
+
+                key = zobrist_key(child_columns, table)
+                if key in seen:
+                    seen.move_to_end(key)
+                    if seen[key] >= child_score:
+                        continue
+                seen[key] = child_score
+                if len(seen) > table_size:
+                    seen.popitem(last=False)
+                children.append((child_score + poppable_points(child_columns), child_score, child_columns,
+                                 child_pair_counts, moves + [(row_count - level, col + 1)]))
+        if not children:
+            break
+        children.sort(key=lambda child: child[0], reverse=True)
+        beam = [child[1:] for child in children[:beam_width]]
+
+    for score, columns, pair_counts, moves in beam:
+        if time.perf_counter() >= deadline:
+            break
+        score, moves = finish_greedily(columns, pair_counts, score, moves, row_count, deadline)
+        if score > best_score:
+            best_score, best_moves = score, moves
+    return best_score, best_moves
+
+def parse_move(line):
+    """
+    Reads a move written as a row and a column number, both starting from 1.
+
+    Parameters:
+    - line (str): The move.
+
+    Returns:
+    - tuple: Row and column indices, or (None, None) if the line is not a move.
+    """
+    input_list = line.split()
+    if len(input_list) == 2 and all(value.lstrip("-").isdigit() for value in input_list):
+        return int(input_list[0]) - 1, int(input_list[1]) - 1
+    return None, None
+
+def replay_game(board, moves, log=False):
+    """
+    Plays the game with recorded moves without any console output. Moves after
+    the game is over are ignored.
+
+    Parameters:
+    - board (list): representing the game board.
+    - moves (iterable): Moves as lines of a row and a column number; empty lines are skipped.
+    - log (bool): Also write one line per move: its number, row, column,
+    result, points gained and the score after it.
+
+    Returns:
+    - str: The move log (if asked), the final board, the score, and "Game over." if the game ended.
+    """
+    row_count = len(board)
+    col_count = len(board[0])
+    columns = board_to_columns(board)
+    pair_counts = [count_columns_pairs(columns, col) for col in range(len(columns))]
+    score = 0
+    log_lines = []
+
+    move_number = 0
+    for line in moves:
+        if not line.strip():
+            continue
+        if is_game_over(columns, pair_counts):
+            break
+        move_number += 1
+        row, col = parse_move(line)
+        result, points = make_move(columns, pair_counts, row_count, col_count, row, col)
+        score += points
+        if log:
+            log_lines.append("{} {} {} {} {}\n".format(move_number, " ".join(line.split()),
+                                                         result.replace(" ", "-"), points, score))
+
+    output = "".join(log_lines)
+    output += board_list_to_str(columns_to_board(columns, row_count, col_count))
+    output += "\nYour score is: {} \n".format(score)
+    if is_game_over(columns, pair_counts):
+        output += "Game over.\n"
+    return output
+
+def replay_session(session):
+    """
+    Replays one recorded session from its files. Runs inside the worker processes of replay_sessions.
+
+    Parameters:
+    - session (tuple): Board file name, move file name ("-" for standard input) and the log flag.
+
+    Returns:
+    - str: Output of replay_game.
+    """
+    board_file, moves_file, log = session
+    board = load_board(board_file)
+    if moves_file == "-":
+        return replay_game(board, sys.stdin, log)
+    with open(moves_file, "r") as file:
+        return replay_game(board, file, log)
+
+def replay_sessions(sessions, workers=None, log=False):
+    """
+    Replays many recorded sessions over a process pool.
+
+    Parameters:
+    - sessions (list): (board file name, move file name) pairs.
+    - workers (int): Number of worker processes, None for one per CPU core.
+    - log (bool): Write the move logs too.
+
+    Returns:
+    - generator: (board file name, move file name, output) in the order of the sessions.
+    """
+    with multiprocessing.Pool(workers) as pool:
+        outputs = pool.imap(replay_session, [(board_file, moves_file, log) for board_file, moves_file in sessions])
+        for (board_file, moves_file), output in zip(sessions, outputs):
+            yield board_file, moves_file, output
+
+# Calls, seconds, counters and set sizes of the instrumented functions, None while profiling is off.
+profile_stats = None
+
+def record_set_size(result):
+    """
+    Adds the size of a set found by a flood fill to the set size histogram.
+
+    Parameters:
+    - result (tuple): Coordinates of the set and its number.
+
+    Returns:
+    - None
+    """
+    profile_stats["set_sizes"][len(result[0])] += 1
+
+def enable_profiling():
+    """
+    Starts counting and timing the hot paths: both flood fills
+    (find_set_of_connected_numbers on list boards and
+    find_set_of_connected_numbers_in_columns in the game, the replay and the
+    solver) together with the sizes of the sets they find, and the move
+    generation and scoring of the solver (find_groups, pop_columns and
+    poppable_points). The functions are wrapped only here, so the game runs at
+    full speed while profiling is off. Worker processes keep their own counts.
+
+    Returns:
+    - dict: profile_stats.
+    """
+    global profile_stats, find_set_of_connected_numbers, find_set_of_connected_numbers_in_columns
+    global find_groups, pop_columns, poppable_points
+    if profile_stats is None:
+        profile_stats = profiling.new_stats("set_sizes")
+        find_set_of_connected_numbers = profiling.instrument(find_set_of_connected_numbers, profile_stats,
+                                                             record_set_size)
+        find_set_of_connected_numbers_in_columns = profiling.instrument(find_set_of_connected_numbers_in_columns,
+                                                                        profile_stats, record_set_size)
+        find_groups = profiling.instrument(find_groups, profile_stats)
+        pop_columns = profiling.instrument(pop_columns, profile_stats)
+        poppable_points = profiling.instrument(poppable_points, profile_stats)
+    return profile_stats
+
+if profiling.is_requested():
+    enable_profiling()
+
+def run(args):
+    """
+    Plays, replays or solves the game as the command line asks.
+
+    Parameters:
+    - args (argparse.Namespace): Parsed arguments of main.
+
+    Returns:
+    - None
+    """
+    if args.sessions:
+        with open(args.sessions, "r") as file:
+            sessions = [tuple(line.split()) for line in file if line.strip()]
+        for board_file, moves_file, output in replay_sessions(sessions, args.workers, args.log):
+            sys.stdout.write("== {} {}\n{}".format(board_file, moves_file, output))
+        return
+    if args.moves:
+        sys.stdout.write(replay_session((args.input_file, args.moves, args.log)))
+        return
+    if args.solve:
+        score, moves = search_best_moves(load_board(args.input_file), args.beam_width, args.time_limit)
+        for row, col in moves:
+            print(row, col)
+        print("Best score:", score)
+        return
+
+    board = load_board(args.input_file)
+    renderer = BoardRenderer(args.render)
+    renderer.draw(board, 0)
+    play_game(board, 0, renderer)
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays the number popping game.")
+    parser.add_argument("input_file", nargs="?", help="board file")
+    parser.add_argument("--moves", help="replay the moves of this file (- for standard input) instead of asking for them")
+    parser.add_argument("--sessions", help="replay every 'board_file moves_file' line of this file over a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --sessions (default: one per CPU core)")
+    parser.add_argument("--log", action="store_true", help="with --moves or --sessions, also write a score line for every move")
+    parser.add_argument("--render", choices=RENDER_MODES, default="full",
+                        help="board output while playing: the whole board, in-place ANSI updates of the "
+                             "changed rows, or a log of the changed rows")
+    parser.add_argument("--solve", action="store_true", help="search for the best move sequence instead of playing")
+    parser.add_argument("--beam-width", type=int, default=16, help="positions kept every round with --solve")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="seconds --solve may take")
+    profiling.add_profile_argument(parser, "the flood fills and the solver's move generation")
+    args = parser.parse_args()
+
+    if args.input_file is None and not args.sessions:
+        parser.error("the board file is required")
+
+    profiling.run_profiled(run, args, enable_profiling)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Run as a script: assignment3 needs the bbm103 package of the repository
+    # root, which is not on the module search path yet.
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assignment3 as game
+
+# Number of an empty cell in the board arrays.
+EMPTY = -1
+POLICIES = ["random", "greedy"]
+
+def boards_from_board(board, count):
+    """
+    Repeats one board for a batch of games.
+
+    Parameters:
+    - board (list): representing the game board.
+    - count (int): Number of games.
+
+    Returns:
+    - numpy.ndarray: (count, rows, columns) int8 array of the boards, EMPTY for empty cells.
+
+    Raises:
+    - ValueError: If a number does not fit in an int8.
+    """
+    cells = [[EMPTY if game.is_empty_cell(board, row, col) else board[row][col]
+              for col in range(len(board[0]))] for row in range(len(board))]
+    limits = np.iinfo(np.int8)
+    if any(not limits.min <= number <= limits.max for row in cells for number in row):
+        raise ValueError("The simulator plays boards of numbers from {} to {}.".format(limits.min, limits.max))
+    array = np.array(cells, dtype=np.int8)
+    return np.repeat(array[None], count, axis=0)
+
+def random_boards(count, row_count, col_count, numbers, generator):
+    """
+    Draws a batch of boards with numbers 1 to numbers.
+
+    Parameters:
+    - count (int): Number of games.
+    - row_count (int): Number of rows.
+    - col_count (int): Number of columns.
+    - numbers (int): Largest number on the boards.
+    - generator (numpy.random.Generator): Random number generator.
+
+    Returns:
+    - numpy.ndarray: (count, rows, columns) int8 array of the boards.
+    """
+    return generator.integers(1, numbers + 1, size=(count, row_count, col_count), dtype=np.int8)
+
+def label_groups(boards):
+    """
+    Labels the sets of connected numbers of every board at once. Every cell
+    starts with its own index as label and takes the smallest label of its
+    neighbours holding the same number until no label changes, so every set
+    ends up labelled with the index of its first cell.
+
+    Parameters:
+    - boards (numpy.ndarray): (games, rows, columns) int8 boards.
+
+    Returns:
+    - tuple: (games, rows, columns) labels (rows * columns for empty cells) and
+    the size of the set of every cell (0 for empty cells).
+    """
+    games, row_count, col_count = boards.shape
+    cells = row_count * col_count
+    filled = boards != EMPTY
+    labels = np.broadcast_to(np.arange(cells, dtype=np.int32).reshape(1, row_count, col_count), boards.shape).copy()
+    labels[~filled] = cells
+
+    # Which neighbour of every cell holds the same number.
+    same_above = np.zeros(boards.shape, dtype=bool)
+    same_above[:, 1:] = filled[:, 1:] & (boards[:, 1:] == boards[:, :-1])
+    same_left = np.zeros(boards.shape, dtype=bool)
+    same_left[:, :, 1:] = filled[:, :, 1:] & (boards[:, :, 1:] == boards[:, :, :-1])
+
+    while True:
+        new_labels = labels.copy()
+        np.minimum(new_labels[:, 1:], np.where(same_above[:, 1:], labels[:, :-1], cells), out=new_labels[:, 1:])
+        np.minimum(new_labels[:, :-1], np.where(same_above[:, 1:], labels[:, 1:], cells), out=new_labels[:, :-1])
+        np.minimum(new_labels[:, :, 1:], np.where(same_left[:, :, 1:], labels[:, :, :-1], cells),
+                   out=new_labels[:, :, 1:])
+        np.minimum(new_labels[:, :, :-1], np.where(same_left[:, :, 1:], labels[:, :, 1:], cells),
+                   out=new_labels[:, :, :-1])
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    # Count the cells of every label, game by game.
+    offsets = (np.arange(games, dtype=np.int64) * (cells + 1)).reshape(games, 1, 1)
+    counts = np.bincount((labels + offsets).ravel(), minlength=games * (cells + 1))
+    sizes = counts[labels + offsets]
+    sizes[~filled] = 0
+    return labels, sizes
+
+def choose_moves(boards, labels, sizes, policy, generator):
+    """
+    Chooses the set every game pops next.
+
+    Parameters:
+    - boards (numpy.ndarray): (games, rows, columns) int8 boards.
+    - labels (numpy.ndarray): Labels from label_groups.
+    - sizes (numpy.ndarray): Set sizes from label_groups.
+    - policy (str): "random" picks one of the sets that can be popped with equal
+    chance, "greedy" picks the set worth the most points.
+    - generator (numpy.random.Generator): Random number generator.
+
+    Returns:
+    - numpy.ndarray: Label of the chosen set of every game, -1 for games that are over.
+    """
+    games, row_count, col_count = boards.shape
+    poppable = (sizes > 1).reshape(games, -1)
+    if policy == "greedy":
+        points = np.where(poppable, boards.reshape(games, -1).astype(np.int32) * sizes.reshape(games, -1), -1)
+    else:
+        # Only the first cell of a set carries its label, so every set is drawn once.
+        first_cells = labels.reshape(games, -1) == np.arange(row_count * col_count)
+        points = np.where(poppable & first_cells, generator.random(poppable.shape), -1)
+    chosen = points.argmax(axis=1)
+    chosen_labels = labels.reshape(games, -1)[np.arange(games), chosen]
+    return np.where(poppable.any(axis=1), chosen_labels, -1)
+
+def pop_groups(boards, labels, sizes, chosen_labels):
+    """
+    Pops the chosen sets, lets the numbers fall and moves the columns left
+    into an empty clicked column, following the rules of assignment3.py. The
+    clicked cell of a set is the cell its label is the index of, its top left cell.
+
+    Parameters:
+    - boards (numpy.ndarray): (games, rows, columns) int8 boards.
+    - labels (numpy.ndarray): Labels from label_groups.
+    - sizes (numpy.ndarray): Set sizes from label_groups.
+    - chosen_labels (numpy.ndarray): Chosen set of every game.
+
+    Returns:
+    - tuple: The new boards and the points every game gained.
+    """
+    games, row_count, col_count = boards.shape
+    popped = labels == chosen_labels.reshape(-1, 1, 1)
+    points = np.where(popped, boards.astype(np.int32), 0).sum(axis=(1, 2))
+    boards = np.where(popped, np.int8(EMPTY), boards)
+
+    # Gravity is a stable sort of every column that puts the popped cells first
+    # (on top); cells that were already empty hold up the numbers above them.
+    order = np.argsort(~popped, axis=1, kind="stable")
+    boards = np.take_along_axis(boards, order, axis=1)
+    clicked_rows, clicked_cols = np.divmod(chosen_labels, col_count)
+    # When every column lost more cells than there are rows above the clicked
+    # one, the clicked row and the rows above it are empty, and moving the
+    # clicked row to the bottom is a roll by one row.
+    lowered = (popped.sum(axis=1) > clicked_rows.reshape(-1, 1)).all(axis=1)
+    boards[lowered] = np.roll(boards[lowered], -1, axis=1)
+    # A clicked column left empty goes to the right, keeping the order of the others.
+    collapsed = (boards[np.arange(games), :, clicked_cols] == EMPTY).all(axis=1)
+    moved = np.zeros((games, col_count), dtype=bool)
+    moved[np.arange(games)[collapsed], clicked_cols[collapsed]] = True
+    order = np.argsort(moved, axis=1, kind="stable")
+    boards = np.take_along_axis(boards, order[:, None, :], axis=2)
+    return boards, points
+
+def simulate(boards, policy, generator):
+    """
+    Plays a batch of games until none of them can pop a set any more.
+
+    Parameters:
+    - boards (numpy.ndarray): (games, rows, columns) int8 boards.
+    - policy (str): One of POLICIES.
+    - generator (numpy.random.Generator): Random number generator.
+
+    Returns:
+    - numpy.ndarray: Final score of every game.
+    """
+    scores = np.zeros(len(boards), dtype=np.int64)
+    active = np.arange(len(boards))
+    while len(active):
+        labels, sizes = label_groups(boards)
+        chosen_labels = choose_moves(boards, labels, sizes, policy, generator)
+        playing = chosen_labels != -1
+        # Finished games leave the batch, so later rounds only work on the others.
+        boards, labels, sizes = boards[playing], labels[playing], sizes[playing]
+        active = active[playing]
+        boards, points = pop_groups(boards, labels, sizes, chosen_labels[playing])
+        scores[active] += points
+    return scores
+
+def simulate_batch(task):
+    """
+    Plays one batch of games. Runs inside the worker processes of simulate_games.
+
+    Parameters:
+    - task (tuple): Board (list) or None for random boards, board shape
+    (rows, columns, numbers), number of games, policy and seed.
+
+    Returns:
+    - numpy.ndarray: Final score of every game.
+    """
+    board, shape, count, policy, seed = task
+    generator = np.random.default_rng(seed)
+    if board is None:
+        boards = random_boards(count, shape[0], shape[1], shape[2], generator)
+    else:
+        boards = boards_from_board(board, count)
+    return simulate(boards, policy, generator)
+
+def simulate_games(board, shape, games, policy, batch_size=1024, workers=None, seed=0):
+    """
+    Plays many games in batches over a process pool.
+
+    Parameters:
+    - board (list): Starting board of every game, None for random boards.
+    - shape (tuple): (rows, columns, numbers) of the random boards.
+    - games (int): Number of games.
+    - policy (str): One of POLICIES.
+    - batch_size (int): Games played together by one worker.
+    - workers (int): Number of worker processes, None for one per CPU core.
+    - seed (int): Seed of the first batch; batch i uses seed + i.
+
+    Returns:
+    - numpy.ndarray: Final score of every game.
+    """
+    tasks = []
+    for index, start in enumerate(range(0, games, batch_size)):
+        tasks.append((board, shape, min(batch_size, games - start), policy, seed + index))
+    with multiprocessing.Pool(workers) as pool:
+        return np.concatenate(list(pool.imap(simulate_batch, tasks)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays many games of the number popping game and summarizes the scores.")
+    parser.add_argument("input_file", nargs="?", help="starting board (default: random boards, see --size)")
+    parser.add_argument("--size", type=int, nargs=3, default=[10, 10, 4], metavar=("ROWS", "COLUMNS", "NUMBERS"),
+                        help="shape of the random boards and their largest number")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--policy", choices=POLICIES, default="random")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not 1 <= args.size[2] <= np.iinfo(np.int8).max:
+        parser.error("NUMBERS must be from 1 to {}".format(np.iinfo(np.int8).max))
+
+    board = game.load_board(args.input_file) if args.input_file else None
+    scores = simulate_games(board, tuple(args.size), args.games, args.policy,
+                            args.batch_size, args.workers, args.seed)
+    print("Games:", len(scores))
+    print("Mean score: {:.2f}".format(scores.mean()))
+    print("Standard deviation: {:.2f}".format(scores.std()))
+    print("Min / median / max: {} / {} / {}".format(scores.min(), int(np.median(scores)), scores.max()))
+    print("Percentiles 5 / 25 / 75 / 95: {}".format(" / ".join(str(int(value)) for value in
+                                                              np.percentile(scores, [5, 25, 75, 95]))))
+
+if __name__ == "__main__":
+    main()
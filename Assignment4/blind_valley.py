@@ -1,8 +1,16 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
 import sys
 
-# Getting the name of the input file from command line arguments.
-input_file_name = sys.argv[1]
-output_file_name = sys.argv[2]
+if __name__ == "__main__":
+    # Run as a script: the bbm103 package of helpers shared by the assignments
+    # is in the repository root, which is not on the module search path yet.
+    # Importers put it there themselves, so importing changes nothing.
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bbm103 import corpus, profiling
 
 def readFile(input_file_name):
     """Reads the file and converts its content into a 2D list.
@@ -21,6 +29,35 @@ def readFile(input_file_name):
             grid.append(row_values)
     return grid
 
+def parse_puzzle_record(lines):
+    """Converts the lines of one puzzle to its letter grid and restrictions.
+    The letter rows are decoded with bytes.translate instead of being split.
+
+    Parameters:
+    lines : list - The four restriction lines and the letter rows, as bytes.
+
+    Returns:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    """
+    if len(lines) < 5:
+        raise ValueError("A puzzle needs four restriction lines and at least one row.")
+    restrictions = [[int(value) for value in line.split()] for line in lines[:4]]
+    letter_grid = [list(line.translate(None, b" \t").decode("ascii")) for line in lines[4:]]
+    return letter_grid, restrictions
+
+def iterate_puzzles(path):
+    """Streams the puzzles of a corpus file holding puzzles separated by empty lines.
+
+    Parameters:
+    path : str - The name of the corpus file.
+
+    Yields:
+    tuple - The letter grid and the restrictions of every puzzle.
+    """
+    for lines in corpus.iterate_corpus_records(path):
+        yield parse_puzzle_record(lines)
+
 def getSepGrids(grid):
     """Separates the input grid into different components.
 
@@ -106,7 +143,56 @@ def checkRestrictions(new_grid, restrictions):
             return False
     return True  # Return True if all restrictions are met
 
-def is_valid_placement(new_grid, row, col, restrictions):
+def buildCounts(new_grid):
+    """Counts the 'H' and 'B' cells of every row and column.
+
+    Parameters:
+    new_grid : list - The current state of the solution grid.
+
+    Returns:
+    counts : list - Row 'H', row 'B', column 'H' and column 'B' counts,
+    in the same order as the restrictions.
+    """
+    counts = [[0] * len(new_grid), [0] * len(new_grid), [0] * len(new_grid[0]), [0] * len(new_grid[0])]
+    for i in range(len(new_grid)):
+        for j in range(len(new_grid[0])):
+            updateCounts(counts, i, j, new_grid[i][j], 1)
+    return counts
+
+def updateCounts(counts, row, col, symbol, delta):
+    """Adds delta to the counts of a cell's row and column for its symbol.
+
+    Parameters:
+    counts : list - Counts built by buildCounts.
+    row : int - The row of the cell.
+    col : int - The column of the cell.
+    symbol : str - The symbol placed on (or removed from) the cell.
+    delta : int - 1 when the symbol is placed, -1 when it is removed.
+    """
+    if symbol == 'H':
+        counts[0][row] += delta
+        counts[2][col] += delta
+    elif symbol == 'B':
+        counts[1][row] += delta
+        counts[3][col] += delta
+
+def checkCountRestrictions(counts, restrictions):
+    """Checks if all the restrictions are met, reading the running counts.
+
+    Parameters:
+    counts : list - Counts built by buildCounts.
+    restrictions : list - A list of restriction values for rows and columns.
+
+    Returns:
+    bool - True if all restrictions are met, else False.
+    """
+    for restriction, count in zip(restrictions, counts):
+        for i in range(len(restriction)):
+            if restriction[i] != -1 and count[i] != restriction[i]:
+                return False
+    return True
+
+def is_valid_placement(new_grid, row, col, restrictions, counts=None):
     """Checks if the current placement is valid according to game rules and restrictions.
 
     Parameters:
@@ -114,6 +200,8 @@ def is_valid_placement(new_grid, row, col, restrictions):
     row : int - The current row of placement.
     col : int - The current column of placement.
     restrictions : list - A list of restriction values for rows and columns.
+    counts : list - Running counts from buildCounts; when given, the counts
+    are read from it instead of scanning the row and the column.
 
     Returns:
     bool - True if the placement is valid, else False.
@@ -125,10 +213,16 @@ def is_valid_placement(new_grid, row, col, restrictions):
         return False
 
     # Checking 'H' and 'B' counts against restrictions for the row and column
-    count_h_row = new_grid[row].count('H')
-    count_b_row = new_grid[row].count('B')
-    count_h_col = sum(1 for r in range(len(new_grid)) if new_grid[r][col] == 'H')
-    count_b_col = sum(1 for r in range(len(new_grid)) if new_grid[r][col] == 'B')
+    if counts is not None:
+        count_h_row = counts[0][row]
+        count_b_row = counts[1][row]
+        count_h_col = counts[2][col]
+        count_b_col = counts[3][col]
+    else:
+        count_h_row = new_grid[row].count('H')
+        count_b_row = new_grid[row].count('B')
+        count_h_col = sum(1 for r in range(len(new_grid)) if new_grid[r][col] == 'H')
+        count_b_col = sum(1 for r in range(len(new_grid)) if new_grid[r][col] == 'B')
 
     if restrictions[0][row] != -1 and count_h_row > restrictions[0][row]:  # Check 'H' for row
         return False
@@ -140,52 +234,1090 @@ def is_valid_placement(new_grid, row, col, restrictions):
         return False
     return True
 
-def solve_puzzle(row, col, letter_grid, new_grid, restrictions):
+def solve_puzzle(row, col, letter_grid, new_grid, restrictions, counts=None):
     """Solves the puzzle using backtracking algorithm.
 
+    The search keeps its own stack of placed dominoes instead of recursing
+    once per cell, so it goes straight from one domino to the next and is not
+    limited by the recursion limit on large boards. Dominoes are tried in the
+    same order as before: 'HB', 'BH', 'NN', then left empty ('A').
+
     Parameters:
-    row : int - The current row in the grid.
-    col : int - The current column in the grid.
+    row : int - The row to start the search from.
+    col : int - The column to start the search from.
     letter_grid : list - A 2D list representing the letters 'L' or 'U'.
     new_grid : list - The current state of the solution grid.
     restrictions : list - A list of restriction values for rows and columns.
+    counts : list - Running 'H'/'B' counts of new_grid, built when not given
+    and kept up to date on every placement and backtrack.
 
     Returns:
     list - A 2D list representing the solved grid or None if no solution exists.
     """
-    if row == len(letter_grid):  # If end of grid is reached
-        if checkRestrictions(new_grid, restrictions):
+    if counts is None:
+        counts = buildCounts(new_grid)
+    attempts = [('H', 'B'), ('B', 'H'), ('N', 'N')]  # Try 'HB', 'BH', then 'NN'
+
+    # The first cell of every domino from (row, col) on, with its other cell.
+    dominoes = []
+    for i in range(row, len(letter_grid)):
+        for j in range(col if i == row else 0, len(letter_grid[0])):
+            if letter_grid[i][j] in ['L', 'U']:
+                delta_row, delta_col = (1, 0) if letter_grid[i][j] == 'U' else (0, 1)
+                dominoes.append((i, j, i + delta_row, j + delta_col))
+
+    # stack[k] - [index into dominoes, index of the attempt placed there]; the
+    # attempt index len(attempts) means the domino was left empty.
+    stack = []
+    index = 0
+    while True:
+        # Step to the next domino whose first cell is still empty.
+        while index < len(dominoes):
+            i, j, adjacent_row, adjacent_col = dominoes[index]
+            if new_grid[i][j] == 'A':
+                if 0 <= adjacent_row < len(letter_grid) and 0 <= adjacent_col < len(letter_grid[0]):
+                    break
+                new_grid[i][j] = attempts[-1][0]  # A domino cut off by the border
+            index += 1
+
+        if index < len(dominoes):
+            stack.append([index, -1])
+            if profile_stats is not None:
+                profile_stats["counters"]["nodes"] += 1
+        elif checkCountRestrictions(counts, restrictions):
             return new_grid
-        else:
+        elif not stack:
             return None  # No solution found
 
-    if col == len(letter_grid[0]):  # If end of row is reached
-        return solve_puzzle(row + 1, 0, letter_grid, new_grid, restrictions)
-
-    if new_grid[row][col] == 'A' and letter_grid[row][col] in ['L', 'U']:
-        for attempt in [('H', 'B'), ('B', 'H'), ('N', 'N')]:  # Try 'HB', 'BH', then 'NN'
-            new_grid[row][col] = attempt[0]
-            delta_row, delta_col = (1, 0) if letter_grid[row][col] == 'U' else (0, 1)
-            adjacent_row, adjacent_col = row + delta_row, col + delta_col
-            
-            if 0 <= adjacent_row < len(letter_grid) and 0 <= adjacent_col < len(letter_grid[0]):
-                new_grid[adjacent_row][adjacent_col] = attempt[1]
-                
-                if is_valid_placement(new_grid, row, col, restrictions):
-                    result = solve_puzzle(row, col + 1, letter_grid, new_grid, restrictions)
-                    if result:
-                        return result  # Successful placement
-                
-                # Backtrack if not successful or if restrictions aren't met
-                new_grid[row][col], new_grid[adjacent_row][adjacent_col] = 'A', 'A'
-    return solve_puzzle(row, col + 1, letter_grid, new_grid, restrictions)  # Continue to next cell
+        # Move the top domino on to its next attempt, backtracking when it has none.
+        while True:
+            frame = stack[-1]
+            i, j, adjacent_row, adjacent_col = dominoes[frame[0]]
+            if 0 <= frame[1] < len(attempts):
+                updateCounts(counts, i, j, new_grid[i][j], -1)
+                updateCounts(counts, adjacent_row, adjacent_col, new_grid[adjacent_row][adjacent_col], -1)
+                new_grid[i][j], new_grid[adjacent_row][adjacent_col] = 'A', 'A'
+            elif frame[1] == len(attempts):
+                stack.pop()
+                if profile_stats is not None:
+                    profile_stats["counters"]["backtracks"] += 1
+                if not stack:
+                    return None  # No solution found
+                continue
 
-def main():
-    """Main function to read file, prepare the grid, and solve the puzzle."""
-    grid = readFile(input_file_name)
-    letter_grid, new_grid, restrictions = getSepGrids(grid)
-    solved_grid = solve_puzzle(0, 0, letter_grid, new_grid, restrictions)
-    with open(output_file_name, "w") as file:
+            frame[1] += 1
+            while frame[1] < len(attempts):
+                attempt = attempts[frame[1]]
+                new_grid[i][j], new_grid[adjacent_row][adjacent_col] = attempt
+                updateCounts(counts, i, j, attempt[0], 1)
+                updateCounts(counts, adjacent_row, adjacent_col, attempt[1], 1)
+                if is_valid_placement(new_grid, i, j, restrictions, counts):
+                    break
+                updateCounts(counts, i, j, attempt[0], -1)
+                updateCounts(counts, adjacent_row, adjacent_col, attempt[1], -1)
+                new_grid[i][j], new_grid[adjacent_row][adjacent_col] = 'A', 'A'
+                frame[1] += 1
+            index = frame[0] + 1
+            break
+
+def grid_to_bits(new_grid):
+    """Converts a solution grid to row bitmasks; bit col of a row mask is the
+    cell in that column.
+
+    Parameters:
+    new_grid : list - The current state of the solution grid.
+
+    Returns:
+    tuple - The 'H' masks, the 'B' masks and the filled (not 'A') masks of the rows.
+    """
+    h_rows, b_rows, filled_rows = [], [], []
+    for row in new_grid:
+        h_rows.append(sum(1 << col for col, symbol in enumerate(row) if symbol == 'H'))
+        b_rows.append(sum(1 << col for col, symbol in enumerate(row) if symbol == 'B'))
+        filled_rows.append(sum(1 << col for col, symbol in enumerate(row) if symbol != 'A'))
+    return h_rows, b_rows, filled_rows
+
+def bits_to_grid(h_rows, b_rows, filled_rows, width):
+    """Converts row bitmasks back to a solution grid.
+
+    Parameters:
+    h_rows : list - The 'H' masks of the rows.
+    b_rows : list - The 'B' masks of the rows.
+    filled_rows : list - The filled masks of the rows; filled cells that are
+    neither 'H' nor 'B' are 'N'.
+    width : int - The number of columns.
+
+    Returns:
+    list - A 2D list of 'H', 'B', 'N' and 'A'.
+    """
+    grid = []
+    for h_row, b_row, filled_row in zip(h_rows, b_rows, filled_rows):
+        grid.append(['H' if h_row >> col & 1 else 'B' if b_row >> col & 1 else
+                     'N' if filled_row >> col & 1 else 'A' for col in range(width)])
+    return grid
+
+def bits_to_text(h_rows, b_rows, filled_rows, width):
+    """Converts row bitmasks to the text written to the output file.
+
+    Parameters:
+    h_rows : list - The 'H' masks of the rows.
+    b_rows : list - The 'B' masks of the rows.
+    filled_rows : list - The filled masks of the rows.
+    width : int - The number of columns.
+
+    Returns:
+    str - The rows, their cells separated by spaces, without a final newline.
+    """
+    return "\n".join(" ".join(row) for row in bits_to_grid(h_rows, b_rows, filled_rows, width))
+
+def popcount(mask):
+    """Counts the set bits of a mask, for Pythons without int.bit_count (before 3.10).
+
+    Parameters:
+    mask : int - The mask.
+
+    Returns:
+    int - The number of set bits.
+    """
+    return bin(mask).count("1")
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+
+def solve_puzzle_bits(letter_grid, new_grid, restrictions):
+    """Solves the puzzle with the same search as solve_puzzle on row bitmasks.
+
+    Every row keeps an 'H', a 'B' and a filled mask and every column an 'H'
+    and a 'B' mask, so the neighbour checks are shifts and ANDs and the counts
+    are bit counts. It tries the dominoes in the same order as solve_puzzle
+    and returns the same solution.
+
+    Parameters:
+    letter_grid : list - A 2D list representing the letters 'L' or 'U'.
+    new_grid : list - The starting state of the solution grid.
+    restrictions : list - A list of restriction values for rows and columns.
+
+    Returns:
+    tuple - The 'H', 'B' and filled masks of the rows (see bits_to_grid), or
+    None if no solution exists.
+    """
+    height, width = len(letter_grid), len(letter_grid[0])
+    h_rows, b_rows, filled_rows = grid_to_bits(new_grid)
+    h_cols = [sum((h_rows[row] >> col & 1) << row for row in range(height)) for col in range(width)]
+    b_cols = [sum((b_rows[row] >> col & 1) << row for row in range(height)) for col in range(width)]
+    masks = {'H': (h_rows, h_cols), 'B': (b_rows, b_cols)}
+    attempts = [('H', 'B'), ('B', 'H'), ('N', 'N')]  # Try 'HB', 'BH', then 'NN'
+    # Only the restricted rows and columns are checked when the grid is full.
+    checks = [(target, lines, i) for targets, lines in zip(restrictions, [h_rows, b_rows, h_cols, b_cols])
+              for i, target in enumerate(targets) if target != -1]
+    row_checks = [[(target, lines, row) for target, lines in [(restrictions[0][row], h_rows), (restrictions[1][row], b_rows)]
+                   if target != -1] for row in range(height)]
+
+    # dominoes[d] - the first cell, the other cell, and for every attempt the
+    # (mask list, index, bits) to XOR in to place it (and again to take it back).
+    dominoes = []
+    for i in range(height):
+        for j in range(width):
+            if letter_grid[i][j] in ['L', 'U']:
+                delta_row, delta_col = (1, 0) if letter_grid[i][j] == 'U' else (0, 1)
+                adjacent_row, adjacent_col = i + delta_row, j + delta_col
+                moves = []
+                for attempt in attempts:
+                    ops = [(filled_rows, i, 1 << j), (filled_rows, adjacent_row, 1 << adjacent_col)]
+                    for (row, col), symbol in zip([(i, j), (adjacent_row, adjacent_col)], attempt):
+                        if symbol != 'N':
+                            ops += [(masks[symbol][0], row, 1 << col), (masks[symbol][1], col, 1 << row)]
+                    moves.append(ops)
+                dominoes.append((i, j, adjacent_row, adjacent_col, moves))
+
+    def is_valid(row, col, symbol):
+        """is_valid_placement for the first cell of a domino."""
+        bit = 1 << col
+        if symbol == 'N':
+            if filled_rows[row] & ~(h_rows[row] | b_rows[row]) & (bit >> 1):  # Left cell
+                return False
+            if row > 0 and filled_rows[row - 1] & ~(h_rows[row - 1] | b_rows[row - 1]) & bit:  # Above cell
+                return False
+        else:
+            symbol_rows = masks[symbol][0]
+            if symbol_rows[row] & (bit >> 1) or row > 0 and symbol_rows[row - 1] & bit:
+                return False
+        return not ((restrictions[0][row] != -1 and popcount(h_rows[row]) > restrictions[0][row]) or
+                    (restrictions[1][row] != -1 and popcount(b_rows[row]) > restrictions[1][row]) or
+                    (restrictions[2][col] != -1 and popcount(h_cols[col]) > restrictions[2][col]) or
+                    (restrictions[3][col] != -1 and popcount(b_cols[col]) > restrictions[3][col]))
+
+    # The same stack as solve_puzzle: [index into dominoes, index of the attempt].
+    stack = []
+    index = 0
+    while True:
+        while index < len(dominoes):
+            i, j, adjacent_row, adjacent_col, moves = dominoes[index]
+            if not filled_rows[i] >> j & 1:
+                if 0 <= adjacent_row < height and 0 <= adjacent_col < width:
+                    break
+                filled_rows[i] |= 1 << j  # A domino cut off by the border is left 'N'
+            index += 1
+
+        if index < len(dominoes):
+            # The rows above the next domino can no longer change, so the ones
+            # completed since the last domino must already meet their targets.
+            first_row = dominoes[stack[-1][0]][0] if stack else 0
+            if all(popcount(lines[i]) == target for row in range(first_row, dominoes[index][0])
+                   for target, lines, i in row_checks[row]):
+                stack.append([index, -1])
+                if profile_stats is not None:
+                    profile_stats["counters"]["nodes"] += 1
+            elif not stack:
+                return None
+        elif all(popcount(lines[i]) == target for target, lines, i in checks):
+            return h_rows, b_rows, filled_rows
+        elif not stack:
+            return None
+
+        while True:
+            frame = stack[-1]
+            i, j, adjacent_row, adjacent_col, moves = dominoes[frame[0]]
+            if 0 <= frame[1] < len(attempts):
+                for lines, k, bits in moves[frame[1]]:
+                    lines[k] ^= bits
+            elif frame[1] == len(attempts):
+                stack.pop()
+                if profile_stats is not None:
+                    profile_stats["counters"]["backtracks"] += 1
+                if not stack:
+                    return None
+                continue
+
+            frame[1] += 1
+            while frame[1] < len(attempts):
+                for lines, k, bits in moves[frame[1]]:
+                    lines[k] ^= bits
+                if is_valid(i, j, attempts[frame[1]][0]):
+                    break
+                for lines, k, bits in moves[frame[1]]:
+                    lines[k] ^= bits
+                frame[1] += 1
+            index = frame[0] + 1
+            break
+
+# Domino values of the propagation engine, as bits of a domain mask, in the
+# order the backtracker tries them: 'HB', 'BH', then 'NN'.
+DOMINO_VALUES = {1: ('H', 'B'), 2: ('B', 'H'), 4: ('N', 'N')}
+ALL_DOMINO_VALUES = 7
+# How many choices the search makes between two checks of should_stop.
+STOP_CHECK_INTERVAL = 64
+# Failed choices before the mrv search starts over from the root, keeping the
+# conflict weights it learned; the limit grows by half after every restart.
+RESTART_FAILURES = 100
+# Prefixes handed to every worker when the split depth is picked automatically.
+PREFIXES_PER_WORKER = 8
+# VALUES_WITH[symbol][end] - the values that put symbol on that end of a domino.
+VALUES_WITH = {'H': (1, 2), 'B': (2, 1)}
+# LINE_OPTIONS[end] - (value, symbol of the first cell, symbol of the last cell,
+# 'H' cells, 'B' cells) of the values of a domino in a line, with the symbols
+# numbered 'H', 'B', 'N'; end is the end of a domino crossing the line, or
+# None for a domino lying in it.
+LINE_OPTIONS = {
+    None: ((1, 0, 1, 1, 1), (2, 1, 0, 1, 1), (4, 2, 2, 0, 0)),
+    0: ((1, 0, 0, 1, 0), (2, 1, 1, 0, 1), (4, 2, 2, 0, 0)),
+    1: ((2, 0, 0, 1, 0), (1, 1, 1, 0, 1), (4, 2, 2, 0, 0)),
+}
+
+class PropagationSolver:
+    """Forward-checking solver that keeps the remaining values of every domino.
+
+    Every domino starts with the values 'HB', 'BH' and 'NN'. Placing a domino
+    removes the values that would put the same 'H' or 'B' next to it, and each
+    row and column keeps only the values that still lie on a way through the
+    line meeting both of its targets (see check_line). The search is an
+    explicit stack over a trail of domain changes, so it has no recursion limit.
+
+    Half clued boards of 32x32 solve in about a second with mrv. Fully clued
+    boards have only a few solutions and stay hard: 12x12 takes up to a few
+    seconds, 16x16 from a second to over a minute, and most 20x20 boards more
+    than that, so give solve a should_stop for those.
+    """
+
+    def __init__(self, letter_grid, restrictions, mrv=True):
+        """Builds the dominoes, the rows/columns they touch and their neighbours.
+
+        Parameters:
+        letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+        restrictions : list - A list of restriction values for rows and columns.
+        mrv : bool - Branch on the domino with the fewest values left per
+        conflict weight of its rows and columns (dom/wdeg) and restart the
+        search now and then (see RESTART_FAILURES); when False, branch on the
+        first open domino (row by row), which returns the same solution as the
+        backtracker's try order but can take seconds on half clued 12x12 boards.
+        """
+        self.letter_grid = letter_grid
+        self.mrv = mrv
+        row_count, col_count = len(letter_grid), len(letter_grid[0])
+
+        # dominoes[d] - the cells (row, col) of its 'L'/'U' end and of its 'R'/'D' end.
+        self.dominoes = []
+        cell_domino = {}
+        for row in range(row_count):
+            for col in range(col_count):
+                if letter_grid[row][col] in ['L', 'U']:
+                    delta_row, delta_col = (1, 0) if letter_grid[row][col] == 'U' else (0, 1)
+                    cells = ((row, col), (row + delta_row, col + delta_col))
+                    for end, cell in enumerate(cells):
+                        cell_domino[cell] = (len(self.dominoes), end)
+                    self.dominoes.append(cells)
+
+        # Lines are the rows followed by the columns. lines_of[d] - the lines
+        # domino d has a cell in.
+        line_count = row_count + col_count
+        self.lines_of = []
+        for d, cells in enumerate(self.dominoes):
+            lines = []
+            for row, col in cells:
+                for line in (row, row_count + col):
+                    if line not in lines:
+                        lines.append(line)
+            self.lines_of.append(lines)
+
+        # line_cells[line] - the (position, domino, end) of every cell of the line, in order.
+        self.line_cells = [[] for _ in range(line_count)]
+        for d, cells in enumerate(self.dominoes):
+            for end, (row, col) in enumerate(cells):
+                self.line_cells[row].append((col, d, end))
+                self.line_cells[row_count + col].append((row, d, end))
+        for cells in self.line_cells:
+            cells.sort()
+
+        self.targets = {'H': restrictions[0] + restrictions[2], 'B': restrictions[1] + restrictions[3]}
+
+        # neighbours[d][end] - the (domino, end) pairs next to that end, except its partner.
+        self.neighbours = []
+        for d, cells in enumerate(self.dominoes):
+            ends = []
+            for row, col in cells:
+                around = []
+                for other in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                    if other in cell_domino and cell_domino[other][0] != d:
+                        around.append(cell_domino[other])
+                ends.append(around)
+            self.neighbours.append(ends)
+
+        # line_items[line] - the dominoes of the line in order as (domino, end,
+        # follows): end is None for a domino lying in the line, and follows
+        # tells if its first cell is next to the cell before it.
+        self.line_items = []
+        for line, cells in enumerate(self.line_cells):
+            items = []
+            last_position = None
+            for position, d, end in cells:
+                lying = all(line in (row, row_count + col) for row, col in self.dominoes[d])
+                if not (lying and end == 1):
+                    items.append((d, None if lying else end, last_position == position - 1))
+                last_position = position
+            self.line_items.append(items)
+
+        # The counts of check_line are the bits h * width + b of a state mask, with
+        # h and b the 'H' and 'B' cells so far, at most their targets (or the
+        # cells of the line when not given). line_shapes[line] holds width, the
+        # mask of all states, of the states with b at its limit and with b == 0,
+        # and of the final states meeting the targets.
+        self.line_shapes = []
+        for line, cells in enumerate(self.line_cells):
+            target_h, target_b = self.targets['H'][line], self.targets['B'][line]
+            limit_h = len(cells) if target_h == -1 else target_h
+            limit_b = len(cells) if target_b == -1 else target_b
+            width = limit_b + 1
+            rows = range(limit_h + 1)
+            accept = 0
+            for h in rows:
+                for b in range(width):
+                    if target_h in [-1, h] and target_b in [-1, b]:
+                        accept |= 1 << (h * width + b)
+            self.line_shapes.append((width, (1 << (len(rows) * width)) - 1,
+                                     sum(1 << (h * width + limit_b) for h in rows),
+                                     sum(1 << (h * width) for h in rows), accept))
+
+        self.valid_layout = all(0 <= row < row_count and 0 <= col < col_count and
+                                letter_grid[row][col] in ['R', 'D']
+                                for first, (row, col) in self.dominoes)
+        self.domains = [ALL_DOMINO_VALUES] * len(self.dominoes)
+        self.weights = [1] * (row_count + col_count)
+        self.trail = []
+        self.dirty = set(range(row_count + col_count))
+        self.placed = []
+
+    def restrict(self, d, values):
+        """Keeps only the given values in a domino's domain, recording the change.
+
+        Parameters:
+        d : int - The domino.
+        values : int - Mask of the values that may stay.
+
+        Returns:
+        bool - False if the domino has no value left, else True.
+        """
+        old = self.domains[d]
+        new = old & values
+        if new == old:
+            return True
+        self.trail.append((d, old))
+        self.domains[d] = new
+        if new == 0:
+            return False
+        self.dirty.update(self.lines_of[d])
+        if new & (new - 1) == 0:
+            self.placed.append(d)
+        return True
+
+    def check_line(self, line):
+        """Applies the 'H' and 'B' targets of one row or column, together with
+        the rule that two neighbouring cells of the line never hold the same
+        'H' or 'B'. A pass along the line collects the reachable counts after
+        every domino as bits of a state mask (see line_shapes), and a pass
+        back keeps only the values of each domino that lie on a way through
+        the line meeting both targets. A domino lying in the line adds one 'H'
+        and one 'B' or neither, so the two targets are applied at once.
+
+        Parameters:
+        line : int - The row, or the number of rows plus the column.
+
+        Returns:
+        bool - False if the targets can no longer be met, else True.
+        """
+        if self.targets['H'][line] == -1 and self.targets['B'][line] == -1:
+            return True
+        width, states_mask, top_b, bottom_b, accept = self.line_shapes[line]
+        items = self.line_items[line]
+
+        # sources[i][symbol] - the states before domino i that a first cell
+        # holding symbol (0 for 'H', 1 for 'B', 2 for 'N') can follow.
+        sources = []
+        choices = []
+        states = [0, 0, 1]  # By the symbol of the last cell so far, 'N' or none
+        for d, end, follows in items:
+            any_state = states[0] | states[1] | states[2]
+            if follows:
+                item_sources = (states[1] | states[2], states[0] | states[2], any_state)
+            else:
+                item_sources = (any_state, any_state, any_state)
+            sources.append(item_sources)
+            domain = self.domains[d]
+            options = [option for option in LINE_OPTIONS[end] if domain & option[0]]
+            choices.append(options)
+            states = [0, 0, 0]
+            for value, first, last, add_h, add_b in options:
+                mask = item_sources[first]
+                if add_b:
+                    mask = (mask & ~top_b) << 1
+                if add_h:
+                    mask = (mask << width) & states_mask
+                states[last] |= mask
+        if not (states[0] | states[1] | states[2]) & accept:
+            self.weights[line] += 1
+            return False
+
+        # tails[symbol] - the states after domino i, by the symbol of its last
+        # cell, from which the rest of the line can meet the targets.
+        tails = [accept] * 3
+        for index in range(len(items) - 1, -1, -1):
+            d, end, follows = items[index]
+            item_sources = sources[index]
+            by_first = [0, 0, 0]
+            allowed = 0
+            for value, first, last, add_h, add_b in choices[index]:
+                mask = tails[last]
+                if add_h:
+                    mask >>= width
+                if add_b:
+                    mask = (mask & ~bottom_b) >> 1
+                by_first[first] |= mask
+                if item_sources[first] & mask:
+                    allowed |= value
+            if not self.restrict(d, allowed):
+                self.weights[line] += 1
+                return False
+            any_tail = by_first[0] | by_first[1] | by_first[2]
+            tails = [by_first[1] | by_first[2], by_first[0] | by_first[2], any_tail] if follows else [any_tail] * 3
+        return True
+
+    def propagate(self):
+        """Runs the neighbour and row/column rules until nothing changes.
+
+        Returns:
+        bool - False if a contradiction was found, else True.
+        """
+        while self.placed or self.dirty:
+            if self.placed:
+                d = self.placed.pop()
+                for end, symbol in enumerate(DOMINO_VALUES[self.domains[d]]):
+                    if symbol == 'N':
+                        continue
+                    # The same symbol cannot go on a neighbouring cell.
+                    for other, other_end in self.neighbours[d][end]:
+                        if not self.restrict(other, ALL_DOMINO_VALUES & ~VALUES_WITH[symbol][other_end]):
+                            return False
+            elif not self.check_line(self.dirty.pop()):
+                return False
+        return True
+
+    def undo(self, mark):
+        """Restores the domains to the moment the trail was mark entries long.
+
+        Parameters:
+        mark : int - Length of the trail to go back to.
+        """
+        while len(self.trail) > mark:
+            d, old = self.trail.pop()
+            self.domains[d] = old
+        self.dirty.clear()
+        self.placed.clear()
+
+    def select(self):
+        """Chooses the next domino to branch on.
+
+        Returns:
+        int - The domino, or None if every domino is placed.
+        """
+        best, best_score = None, None
+        for d, domain in enumerate(self.domains):
+            if domain & (domain - 1):
+                if not self.mrv:
+                    return d
+                size = 3 if domain == ALL_DOMINO_VALUES else 2
+                score = size / sum(self.weights[line] for line in self.lines_of[d])
+                if best_score is None or score < best_score:
+                    best, best_score = d, score
+        return best
+
+    def to_grid(self):
+        """Converts the placed dominoes to the solution grid.
+
+        Returns:
+        list - A 2D list of 'H', 'B' and 'N' ('A' for cells of no domino).
+        """
+        grid = [['A' for _ in row] for row in self.letter_grid]
+        for d, cells in enumerate(self.dominoes):
+            for (row, col), symbol in zip(cells, DOMINO_VALUES[self.domains[d]]):
+                grid[row][col] = symbol
+        return grid
+
+    def iterate_prefixes(self, depth):
+        """Generates the values of the first dominoes (row by row) that survive
+        propagation, in the try order. Every prefix is a separate part of the
+        search tree, so the parts can be searched on their own.
+
+        Parameters:
+        depth : int - The number of dominoes a prefix fixes.
+
+        Yields:
+        list - The (domino, value) pairs of a prefix.
+        """
+        if not self.valid_layout or not self.propagate():
+            return
+        depth = min(depth, len(self.dominoes))
+        if depth == 0:
+            yield []
+            return
+
+        mark = len(self.trail)
+        stack = [[0, self.domains[0], mark, None]]  # [domino, values not tried yet, trail length, value]
+        while stack:
+            entry = stack[-1]
+            self.undo(entry[2])
+            if entry[1] == 0:
+                stack.pop()
+                continue
+            entry[3] = entry[1] & -entry[1]
+            entry[1] ^= entry[3]
+            if not (self.restrict(entry[0], entry[3]) and self.propagate()):
+                continue
+            if len(stack) == depth:
+                yield [(d, value) for d, values, trail_length, value in stack]
+            else:
+                d = len(stack)
+                stack.append([d, self.domains[d], len(self.trail), None])
+        self.undo(mark)
+
+    def solve(self, should_stop=None):
+        """Searches for a solution with propagation after every choice.
+
+        Parameters:
+        should_stop : callable - Asked every STOP_CHECK_INTERVAL choices; the
+        search gives up when it returns True.
+
+        Returns:
+        list - A 2D list representing the solved grid or None if no solution exists.
+        """
+        if not self.valid_layout or not self.propagate():
+            return None
+
+        root = len(self.trail)
+        failure_limit = RESTART_FAILURES
+        failures = 0
+        stack = []  # [domino, values not tried yet, trail length before trying]
+        choices = 0
+        while True:
+            d = self.select()
+            if d is None:
+                return self.to_grid()
+            choices += 1
+            if should_stop is not None and choices % STOP_CHECK_INTERVAL == 0 and should_stop():
+                return None
+            stack.append([d, self.domains[d], len(self.trail)])
+
+            while stack:
+                entry = stack[-1]
+                self.undo(entry[2])
+                if entry[1] == 0:  # Every value failed, backtrack further
+                    stack.pop()
+                    continue
+                value = entry[1] & -entry[1]
+                entry[1] ^= value
+                if self.restrict(entry[0], value) and self.propagate():
+                    break
+                failures += 1
+                if self.mrv and failures >= failure_limit:
+                    if profile_stats is not None:
+                        profile_stats["counters"]["restarts"] += 1
+                    self.undo(root)
+                    stack.clear()
+                    failures = 0
+                    failure_limit = failure_limit * 3 // 2
+                    break
+            else:
+                return None
+
+def solve_puzzle_propagation(letter_grid, restrictions, mrv=True):
+    """Solves the puzzle with the forward-checking PropagationSolver.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    mrv : bool - Branch on the most constrained domino first (dom/wdeg, see
+    PropagationSolver for the board sizes it handles); when False the solution
+    is the one the try order 'HB', 'BH', 'NN' (row by row) reaches first.
+
+    Returns:
+    list - A 2D list representing the solved grid or None if no solution exists.
+    """
+    return PropagationSolver(letter_grid, restrictions, mrv).solve()
+
+# Index of the lowest prefix with a known solution, shared with the subtree workers.
+found_prefix = None
+
+def init_subtree_worker(found):
+    """Stores the shared found_prefix value in a worker process.
+
+    Parameters:
+    found : multiprocessing.Value - Index of the lowest prefix solved so far.
+    """
+    global found_prefix
+    found_prefix = found
+
+def solve_subtree(letter_grid, restrictions, prefix, index, mrv):
+    """Searches the part of the search tree below one prefix. Runs inside the
+    worker processes and gives up once a prefix before it has a solution.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    prefix : list - The (domino, value) pairs to start from.
+    index : int - The position of the prefix in the try order.
+    mrv : bool - Branch on the most constrained domino first.
+
+    Returns:
+    tuple - The index and the solved grid, or None if the part has no solution.
+    """
+    solver = PropagationSolver(letter_grid, restrictions, mrv)
+    for d, value in prefix:
+        solver.restrict(d, value)
+    return index, solver.solve(lambda: found_prefix.value < index)
+
+def solve_puzzle_parallel(letter_grid, restrictions, mrv=True, workers=None, depth=None):
+    """Solves the puzzle by searching the parts of the search tree on several
+    processes. The executor's workers all take the next prefix from the same
+    queue, so a worker that finishes a small part just picks up another one.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    mrv : bool - Branch on the most constrained domino first and stop at the
+    first solution found; when False, wait for the prefixes before it so the
+    solution is the same as solve_puzzle_propagation(..., mrv=False).
+    workers : int - Number of worker processes, None for one per CPU core.
+    depth : int - Number of dominoes a prefix fixes; None picks the smallest
+    depth giving PREFIXES_PER_WORKER prefixes per worker.
+
+    Returns:
+    list - A 2D list representing the solved grid or None if no solution exists.
+    """
+    workers = workers or os.cpu_count() or 1
+    solver = PropagationSolver(letter_grid, restrictions, mrv)
+    if depth is None:
+        depth = 1
+        prefixes = list(solver.iterate_prefixes(depth))
+        while len(prefixes) < PREFIXES_PER_WORKER * workers and depth < len(solver.dominoes):
+            depth += 1
+            prefixes = list(solver.iterate_prefixes(depth))
+    else:
+        prefixes = list(solver.iterate_prefixes(depth))
+
+    found = multiprocessing.Value('i', len(prefixes))
+    best_index, best_grid = len(prefixes), None
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=init_subtree_worker,
+                                                initargs=(found,)) as executor:
+        futures = {executor.submit(solve_subtree, letter_grid, restrictions, prefix, index, mrv): index
+                   for index, prefix in enumerate(prefixes)}
+        for future in concurrent.futures.as_completed(futures):
+            if future.cancelled():
+                continue
+            index, grid = future.result()
+            if grid is None or index > best_index:
+                continue
+            best_index, best_grid = index, grid
+            # Any solution will do with mrv; otherwise only the prefixes after it can stop.
+            with found.get_lock():
+                found.value = -1 if mrv else index
+            for other, other_index in futures.items():
+                if mrv or other_index > index:
+                    other.cancel()
+    return best_grid
+
+# The symbol on the other end of a domino.
+PARTNER = {'H': 'B', 'B': 'H', 'N': 'N'}
+
+class SolutionCounter:
+    """Counts and lists the solutions of a puzzle row by row.
+
+    Rows are filled one at a time in the backtracker's try order. Everything a
+    row needs from the rows above it is the row right above (its symbols give
+    the neighbours and the lower ends of the vertical dominoes) and the 'H'/'B'
+    counts of the restricted columns, so the number of ways to fill the rest
+    of the grid is memoized on that profile instead of being searched again.
+    """
+
+    def __init__(self, letter_grid, restrictions):
+        """Stores the puzzle.
+
+        Parameters:
+        letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+        restrictions : list - A list of restriction values for rows and columns.
+        """
+        self.letter_grid = letter_grid
+        self.restrictions = restrictions
+        self.row_count, self.col_count = len(letter_grid), len(letter_grid[0])
+        # memos[limit][(row, row above, column counts)] - solutions of the rows left.
+        self.memos = {}
+
+    def cell_options(self, row, col, above, symbols):
+        """Lists the symbols a cell can take, in the try order 'HB', 'BH', 'NN'.
+
+        Parameters:
+        row : int - The row being filled.
+        col : int - The cell's column.
+        above : tuple - The symbols of the row above, None for the first row.
+        symbols : list - The symbols placed on the row so far.
+
+        Returns:
+        tuple - The possible symbols of the cell.
+        """
+        letter = self.letter_grid[row][col]
+        if letter == 'R':
+            return (PARTNER[symbols[col - 1]],) if col > 0 else ()
+        if letter == 'D':
+            return (PARTNER[above[col]],) if above is not None else ()
+        if letter == 'L' and col + 1 < self.col_count or letter == 'U' and row + 1 < self.row_count:
+            return ('H', 'B', 'N')
+        return ()
+
+    def iterate_row_fillings(self, row, above, col_counts):
+        """Generates the ways to fill one row that keep every rule so far.
+
+        Parameters:
+        row : int - The row to fill.
+        above : tuple - The symbols of the row above, None for the first row.
+        col_counts : tuple - 'H' counts then 'B' counts of the restricted
+        columns over the rows above (0 for the other columns).
+
+        Yields:
+        tuple - The symbols of the row and the column counts including it.
+        """
+        width = self.col_count
+        row_targets = {'H': self.restrictions[0][row], 'B': self.restrictions[1][row]}
+        col_targets = self.restrictions[2] + self.restrictions[3]
+        rows_below = self.row_count - row - 1
+        row_counts = {'H': 0, 'B': 0, 'N': 0}
+        counts = list(col_counts)
+        symbols = [None] * width
+        options = [None] * width
+        options[0] = iter(self.cell_options(row, 0, above, symbols))
+        col = 0
+        while col >= 0:
+            if col == width:
+                yield tuple(symbols), tuple(counts)
+                col -= 1
+                continue
+
+            # Take back the symbol tried last on this cell.
+            symbol = symbols[col]
+            if symbol is not None:
+                row_counts[symbol] -= 1
+                if symbol != 'N' and col_targets[col + (width if symbol == 'B' else 0)] != -1:
+                    counts[col + (width if symbol == 'B' else 0)] -= 1
+                symbols[col] = None
+
+            for symbol in options[col]:
+                if symbol != 'N':
+                    index = col + (width if symbol == 'B' else 0)
+                    if col > 0 and symbols[col - 1] == symbol or above is not None and above[col] == symbol:
+                        continue
+                    if row_targets[symbol] != -1 and row_counts[symbol] == row_targets[symbol]:
+                        continue
+                    if col_targets[index] != -1:
+                        if counts[index] == col_targets[index]:
+                            continue
+                        counts[index] += 1
+                row_counts[symbol] += 1
+                symbols[col] = symbol
+                # The rest of the row and the rows below can still reach the
+                # targets; two cells next to each other never share a symbol,
+                # so at most every second cell left can get it.
+                cells_left = width - col - 1
+                if all((row_targets[other] == -1 or
+                        row_targets[other] - row_counts[other] <= (cells_left + (symbol != other)) // 2) and
+                       (col_targets[col + offset] == -1 or
+                        col_targets[col + offset] - counts[col + offset] <= (rows_below + (symbol != other)) // 2)
+                       for other, offset in [('H', 0), ('B', width)]):
+                    break
+                row_counts[symbol] -= 1
+                if symbol != 'N' and col_targets[index] != -1:
+                    counts[index] -= 1
+                symbols[col] = None
+            else:
+                col -= 1
+                continue
+
+            col += 1
+            if col < width:
+                options[col] = iter(self.cell_options(row, col, above, symbols))
+
+    def count_from(self, row, above, col_counts, limit=None):
+        """Counts the ways to fill the rows from row on.
+
+        Parameters:
+        row : int - The first row to fill.
+        above : tuple - The symbols of the row above, None for the first row.
+        col_counts : tuple - Column counts over the rows above.
+        limit : int - Stop counting at this many solutions, None to count all.
+
+        Returns:
+        int - The number of solutions, at most limit.
+        """
+        if row == self.row_count:
+            return 1
+        memo = self.memos.setdefault(limit, {})
+        key = (row, above, col_counts)
+        if key not in memo:
+            total = 0
+            for symbols, counts in self.iterate_row_fillings(row, above, col_counts):
+                total += self.count_from(row + 1, symbols, counts, limit)
+                if limit is not None and total >= limit:
+                    total = limit
+                    break
+            memo[key] = total
+        return memo[key]
+
+    def count(self, limit=None):
+        """Counts the solutions of the puzzle.
+
+        Parameters:
+        limit : int - Stop counting at this many solutions, None to count all.
+
+        Returns:
+        int - The number of solutions, at most limit.
+        """
+        return self.count_from(0, None, (0,) * (2 * self.col_count), limit)
+
+    def iterate_solutions(self, limit=None):
+        """Generates the solutions in the order the backtracker would find them.
+        Only rows that still lead to a solution are entered, so the search
+        never runs into a dead end.
+
+        Parameters:
+        limit : int - Stop after this many solutions, None for all of them.
+
+        Yields:
+        list - A 2D list representing a solved grid.
+        """
+        if limit is not None and limit <= 0 or self.count(1) == 0:
+            return
+        found = 0
+        rows = []
+        stack = [self.iterate_row_fillings(0, None, (0,) * (2 * self.col_count))]
+        while stack:
+            for symbols, counts in stack[-1]:
+                if self.count_from(len(stack), symbols, counts, 1):
+                    break
+            else:
+                stack.pop()
+                continue
+            rows[len(stack) - 1:] = [symbols]  # Also drops the rows of the old branch
+            if len(stack) < self.row_count:
+                stack.append(self.iterate_row_fillings(len(stack), symbols, counts))
+                continue
+            yield [list(row) for row in rows]
+            found += 1
+            if found == limit:
+                return
+
+def count_solutions(letter_grid, restrictions, limit=None):
+    """Counts the solutions of the puzzle.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    limit : int - Stop counting at this many solutions (2 tells whether the
+    solution is unique), None to count all.
+
+    Returns:
+    int - The number of solutions, at most limit.
+    """
+    return SolutionCounter(letter_grid, restrictions).count(limit)
+
+def iterate_solutions(letter_grid, restrictions, limit=None):
+    """Generates the solutions of the puzzle, first the one the backtracker finds.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    limit : int - Stop after this many solutions, None for all of them.
+
+    Yields:
+    list - A 2D list representing a solved grid.
+    """
+    return SolutionCounter(letter_grid, restrictions).iterate_solutions(limit)
+
+ENGINES = ["backtrack", "bits", "propagate", "mrv"]
+
+def load_puzzle(input_file_name):
+    """Reads a puzzle file.
+
+    Parameters:
+    input_file_name : str - The name of the file to read.
+
+    Returns:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    """
+    letter_grid, new_grid, restrictions = getSepGrids(readFile(input_file_name))
+    return letter_grid, restrictions
+
+def solve(letter_grid, restrictions, engine="backtrack", workers=None, split_depth=None):
+    """Solves the puzzle with one of the engines. Does not change its arguments.
+
+    Parameters:
+    letter_grid : list - A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    restrictions : list - A list of restriction values for rows and columns.
+    engine : str - One of ENGINES; mrv is the fastest (see PropagationSolver).
+    workers : int - Search parts of the search tree on this many processes
+    (0: one per CPU core), only with the propagate and mrv engines.
+    split_depth : int - Number of dominoes fixed per part with workers.
+
+    Returns:
+    list - A 2D list representing the solved grid or None if no solution exists.
+    """
+    if engine not in ENGINES:
+        raise ValueError("Unknown engine: {}".format(engine))
+    if workers is not None and engine in ["backtrack", "bits"]:
+        raise ValueError("workers needs the propagate or mrv engine")
+    if workers is not None:
+        return solve_puzzle_parallel(letter_grid, restrictions, engine == "mrv", workers or None, split_depth)
+    if engine in ["propagate", "mrv"]:
+        return solve_puzzle_propagation(letter_grid, restrictions, engine == "mrv")
+    new_grid = [["A" for _ in row] for row in letter_grid]
+    if engine == "bits":
+        solved_bits = solve_puzzle_bits(letter_grid, new_grid, restrictions)
+        return bits_to_grid(*solved_bits, len(new_grid[0])) if solved_bits else None
+    return solve_puzzle(0, 0, letter_grid, new_grid, restrictions)
+
+# Calls, seconds and counters of the instrumented functions, None while profiling is off.
+profile_stats = None
+
+def count_if_false(counter):
+    """Makes a record function for profiling.instrument that counts the calls
+    returning False.
+
+    Parameters:
+    counter : str - Name of the counter.
+
+    Returns:
+    callable - The record function.
+    """
+    def record(result):
+        if not result:
+            profile_stats["counters"][counter] += 1
+    return record
+
+def enable_profiling():
+    """Starts counting and timing the hot paths of every engine:
+    backtrack - solve_puzzle, is_valid_placement (values tried, and the
+    rejected ones), search nodes (dominoes pushed on its stack) and backtracks;
+    bits - solve_puzzle_bits with the same nodes and backtracks;
+    propagate and mrv - PropagationSolver.solve, select (one call per
+    choice), propagate (and its dead ends), check_line (and the lines that
+    fail) and the mrv restarts;
+    --count and --all - SolutionCounter.count_from and cell_options.
+    The functions are wrapped only here and the searches check profile_stats
+    only when they push, pop or restart, so the engines cost next to nothing
+    extra while profiling is off. Worker processes keep their own counts.
+
+    Returns:
+    dict - profile_stats.
+    """
+    global profile_stats, solve_puzzle, is_valid_placement, solve_puzzle_bits
+    if profile_stats is None:
+        profile_stats = profiling.new_stats("counters")
+        solve_puzzle = profiling.instrument(solve_puzzle, profile_stats)
+        is_valid_placement = profiling.instrument(is_valid_placement, profile_stats, count_if_false("rejections"))
+        solve_puzzle_bits = profiling.instrument(solve_puzzle_bits, profile_stats)
+        for name, record in [("solve", None), ("select", None), ("propagate", count_if_false("dead_ends")),
+                             ("check_line", count_if_false("line_failures"))]:
+            setattr(PropagationSolver, name,
+                    profiling.instrument(getattr(PropagationSolver, name), profile_stats, record))
+        for name in ["count_from", "cell_options"]:
+            setattr(SolutionCounter, name, profiling.instrument(getattr(SolutionCounter, name), profile_stats))
+    return profile_stats
+
+if profiling.is_requested():
+    enable_profiling()
+
+def run(args):
+    """Solves the puzzle given on the command line and writes the output file.
+
+    Parameters:
+    args : argparse.Namespace - The parsed arguments of main.
+    """
+    if args.corpus:
+        with open(args.output_file, "w") as file:
+            for index, (letter_grid, restrictions) in enumerate(iterate_puzzles(args.input_file)):
+                solved_grid = solve(letter_grid, restrictions, args.engine, args.workers, args.split_depth)
+                file.write("\n" if index else "")
+                file.write("\n".join(" ".join(row) for row in solved_grid) if solved_grid else "No solution found!")
+                file.write("\n")
+        return
+    letter_grid, restrictions = load_puzzle(args.input_file)
+    if args.count:
+        with open(args.output_file, "w") as file:
+            file.write(str(count_solutions(letter_grid, restrictions, args.limit)))
+        return
+    if args.all:
+        with open(args.output_file, "w") as file:
+            solutions = ["\n".join(" ".join(row) for row in solution)
+                         for solution in iterate_solutions(letter_grid, restrictions, args.limit)]
+            file.write("\n\n".join(solutions) if solutions else "No solution found!")
+        return
+    solved_grid = solve(letter_grid, restrictions, args.engine, args.workers, args.split_depth)
+    with open(args.output_file, "w") as file:
 
         if solved_grid:
             for i, row in enumerate(solved_grid):
@@ -196,5 +1328,38 @@ def main():
         else:
             file.write("No solution found!")
 
+def main():
+    """Main function to read file, prepare the grid, and solve the puzzle."""
+    parser = argparse.ArgumentParser(description="Solves a Blind Valley puzzle.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--engine", choices=ENGINES, default="backtrack",
+                        help="backtrack: cell by cell backtracking (default), bits: the same backtracking "
+                             "on row bitmasks, propagate: forward checking in the same try order (same "
+                             "solution as backtrack, slow on large boards), mrv: forward checking, most "
+                             "constrained domino first (dom/wdeg): about a second on half clued 32x32 boards, "
+                             "but fully clued boards above 12x12 can take minutes")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--count", action="store_true",
+                      help="write the number of solutions instead of a solution")
+    mode.add_argument("--all", action="store_true",
+                      help="write every solution, separated by empty lines")
+    mode.add_argument("--corpus", action="store_true",
+                      help="the input file holds many puzzles separated by empty lines; write a solution "
+                           "for each, separated by empty lines")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="stop --count/--all after this many solutions (2 checks uniqueness)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="search parts of the search tree on this many processes (0: one per CPU core) "
+                             "with the propagate or mrv engine")
+    parser.add_argument("--split-depth", type=int, default=None,
+                        help="number of dominoes fixed per part with --workers (default: picked from --workers)")
+    profiling.add_profile_argument(parser, "the search of the chosen engine")
+    args = parser.parse_args()
+    if args.workers is not None and args.engine in ["backtrack", "bits"]:
+        parser.error("--workers needs --engine propagate or mrv")
+
+    profiling.run_profiled(run, args, enable_profiling)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+import mmap
+import os
+
+# Turns the digits of a row of one-digit numbers into their values (see decode_digit_row).
+DIGIT_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+# Bytes of a corpus read before its pages are handed back to the system.
+RELEASE_BYTES = 1 << 24
+
+def iterate_corpus_records(path):
+    """
+    Streams the records of a corpus file: blocks of lines separated by empty
+    lines, like puzzle or board files written one after another. The file is
+    memory mapped and read line by line, and the pages already read are
+    released every RELEASE_BYTES where mmap.madvise exists (Python 3.8+), so
+    memory use does not grow with the size of the file.
+
+    Parameters:
+    - path (str): The name of the corpus file.
+
+    Returns:
+    - generator: The stripped lines (bytes) of every record.
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            can_release = hasattr(data, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+            released = 0
+            lines = []
+            for line in iter(data.readline, b""):
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                elif lines:
+                    yield lines
+                    lines = []
+                    if can_release and data.tell() - released >= RELEASE_BYTES:
+                        end = data.tell() - data.tell() % mmap.PAGESIZE
+                        data.madvise(mmap.MADV_DONTNEED, released, end - released)
+                        released = end
+            if lines:
+                yield lines
+
+def decode_digit_row(line):
+    """
+    Decodes a row of one-digit numbers separated by single spaces with one
+    bytes.translate call instead of splitting it.
+
+    Parameters:
+    - line (bytes): A stripped row.
+
+    Returns:
+    - bytes: The value of every number, or None if the row is not in that form.
+    """
+    if len(line) % 2 and line[1::2] == b" " * (len(line) // 2):
+        row = line.translate(DIGIT_VALUES, b" ")
+        if max(row) < 10:
+            return row
+    return None
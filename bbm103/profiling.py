@@ -0,0 +1,113 @@
+import cProfile
+import functools
+import json
+import os
+import time
+from collections import Counter
+
+# Set to a file name prefix to count and time the hot paths of the solvers.
+PROFILE_ENV = "BBM103_PROFILE"
+
+def is_requested():
+    """
+    Tells if profiling was asked for through PROFILE_ENV, so a module can turn
+    it on at import time.
+
+    Returns:
+    - bool: True if PROFILE_ENV is set.
+    """
+    return bool(os.environ.get(PROFILE_ENV))
+
+def new_stats(*tables):
+    """
+    Makes an empty statistics dictionary: calls and seconds of every
+    instrumented function, plus the given tables of further counts.
+
+    Parameters:
+    - tables (str): Names of the further tables, like "counters".
+
+    Returns:
+    - dict: Counter of every table.
+    """
+    return {name: Counter() for name in ("calls", "seconds") + tables}
+
+def instrument(function, stats, record=None):
+    """
+    Wraps a function so its calls are counted and timed in stats. Times
+    include nested calls, so recursive functions count their subtrees too.
+
+    Parameters:
+    - function (callable): Function to wrap.
+    - stats (dict): Statistics from new_stats.
+    - record (callable): Gets the result of every call to update further counters, None for none.
+
+    Returns:
+    - callable: The wrapped function.
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        stats["seconds"][name] += time.perf_counter() - start
+        stats["calls"][name] += 1
+        if record is not None:
+            record(result)
+        return result
+    return wrapper
+
+def write_profile(stats, prefix, profiler=None):
+    """
+    Writes the statistics to prefix.json and the statistics of a cProfile
+    profiler, when given, to prefix.pstats (see the pstats module).
+
+    Parameters:
+    - stats (dict): Statistics from new_stats.
+    - prefix (str): File name prefix.
+    - profiler (cProfile.Profile): The profiler, None to write only the JSON file.
+
+    Returns:
+    - None
+    """
+    with open(prefix + ".json", "w") as file:
+        json.dump(stats, file, indent=2, sort_keys=True)
+    if profiler is not None:
+        profiler.dump_stats(prefix + ".pstats")
+
+def add_profile_argument(parser, subject, note=""):
+    """
+    Adds the --profile PREFIX option, which defaults to PROFILE_ENV.
+
+    Parameters:
+    - parser (argparse.ArgumentParser): Parser of the command line.
+    - subject (str): What is counted and timed, for the help text.
+    - note (str): Added to the help text after the default.
+
+    Returns:
+    - None
+    """
+    parser.add_argument("--profile", metavar="PREFIX", default=os.environ.get(PROFILE_ENV),
+                        help="count and time {} and write PREFIX.json and PREFIX.pstats (default: ${}{})".format(
+                            subject, PROFILE_ENV, note))
+
+def run_profiled(run, args, enable_profiling):
+    """
+    Calls run(args), under cProfile and with the counters of the module turned
+    on when args.profile is set, and then writes both profiles.
+
+    Parameters:
+    - run (callable): Runs the command line of a module.
+    - args (argparse.Namespace): Parsed arguments, with the profile option of add_profile_argument.
+    - enable_profiling (callable): Turns the counters of the module on and returns its statistics.
+
+    Returns:
+    - None
+    """
+    if not args.profile:
+        run(args)
+        return
+    stats = enable_profiling()
+    profiler = cProfile.Profile()
+    profiler.runcall(run, args)
+    write_profile(stats, args.profile, profiler)
@@ -0,0 +1,667 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import zipfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+if __name__ == "__main__":
+    # Run as a script, the solvers are imported from their assignment
+    # directories; importers put those on the module search path themselves.
+    sys.path[:0] = [os.path.join(ROOT, name) for name in ["Assignment2", "Assignment3", "Assignment4"]]
+
+import assignment3
+import blind_valley
+import sudoku
+
+SUDOKU_SAMPLES = os.path.join(ROOT, "Assignment2", "BBM103_S23_PA2_Sample_IO_v1.zip")
+BLIND_VALLEY_SAMPLES = os.path.join(ROOT, "Assignment4", "BBM103_F23_PA4_Sample_IO_v2.zip")
+SUITES = ["sudoku", "blind_valley", "pop_game"]
+POP_GAME_OPERATIONS = ["is_game_over", "gravite_numbers", "flood_fill", "pop"]
+
+def read_samples(path):
+    """
+    Reads the sample inputs and outputs of an assignment.
+
+    Parameters:
+    - path (str): Sample .zip archive holding iN.txt inputs and oN.txt outputs.
+
+    Returns:
+    - list: (name, input text, expected output text) of every sample.
+    """
+    samples = []
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        for name in sorted(names):
+            if name.startswith("i") and "o" + name[1:] in names:
+                samples.append((name, archive.read(name).decode(), archive.read("o" + name[1:]).decode()))
+    return samples
+
+def solve_sudoku_grid(grid, engine):
+    """
+    Solves a flat Sudoku grid in place with one of the engines of sudoku.py.
+
+    Parameters:
+    - grid (bytearray): Sudoku grid.
+    - engine (str): Key of sudoku.ENGINES.
+
+    Returns:
+    - bool: True if the engine filled every square.
+    """
+    try:
+        for step in sudoku.ENGINES[engine](grid, sudoku.count_zeros(grid)):
+            pass
+    except (ValueError, TypeError):
+        # The scan engine stops with a TypeError when no square has a single possible number.
+        return False
+    return True
+
+def check_sudoku(engine):
+    """
+    Compares the step logs of an engine with the sample outputs.
+
+    Parameters:
+    - engine (str): Key of sudoku.ENGINES.
+
+    Returns:
+    - list: Names of the samples the engine gets wrong.
+    """
+    failures = []
+    for name, text, expected in read_samples(SUDOKU_SAMPLES):
+        grid = sudoku.parse_sudoku_text(text)
+        try:
+            output = sudoku.render_sudoku_steps(grid, sudoku.count_zeros(grid), engine).decode()
+        except ValueError as error:
+            output = str(error)
+        if output.strip() != expected.strip():
+            failures.append(name)
+    return failures
+
+def is_blind_valley_solution(letter_grid, restrictions, grid):
+    """
+    Checks a Blind Valley solution against the rules: every domino is 'HB',
+    'BH' or 'NN', no two neighbouring cells are both 'H' or both 'B', and
+    every given count matches.
+
+    Parameters:
+    - letter_grid (list): A 2D list of the 'L', 'R', 'U' and 'D' letters.
+    - restrictions (list): A list of restriction values for rows and columns.
+    - grid (list): A 2D list of 'H', 'B' and 'N'.
+
+    Returns:
+    - bool: True if the grid solves the puzzle.
+    """
+    row_count, col_count = len(letter_grid), len(letter_grid[0])
+    for row in range(row_count):
+        for col in range(col_count):
+            symbol = grid[row][col]
+            if symbol not in "HBN":
+                return False
+            if letter_grid[row][col] in "LU":
+                partner = grid[row][col + 1] if letter_grid[row][col] == "L" else grid[row + 1][col]
+                if symbol + partner not in ["HB", "BH", "NN"]:
+                    return False
+            if symbol != "N" and ((row > 0 and grid[row - 1][col] == symbol) or
+                                  (col > 0 and grid[row][col - 1] == symbol)):
+                return False
+    counts = [[row.count("H") for row in grid], [row.count("B") for row in grid],
+              [[grid[row][col] for row in range(row_count)].count("H") for col in range(col_count)],
+              [[grid[row][col] for row in range(row_count)].count("B") for col in range(col_count)]]
+    return all(given in [-1, count] for restriction, counted in zip(restrictions, counts)
+               for given, count in zip(restriction, counted))
+
+def check_blind_valley(engine):
+    """
+    Solves the sample puzzles with an engine. A solution passes when it is the
+    sample output or another grid that follows the rules, since a puzzle may
+    have more than one solution; an unsolvable puzzle must stay unsolved.
+
+    Parameters:
+    - engine (str): One of blind_valley.ENGINES.
+
+    Returns:
+    - list: Names of the samples the engine gets wrong.
+    """
+    failures = []
+    for name, text, expected in read_samples(BLIND_VALLEY_SAMPLES):
+        rows = [line.split() for line in text.strip().split("\n")]
+        restrictions = [[int(value) for value in row] for row in rows[:4]]
+        letter_grid = rows[4:]
+        grid = blind_valley.solve(letter_grid, restrictions, engine)
+        if expected.startswith("No solution"):
+            passed = grid is None
+        else:
+            passed = grid is not None and is_blind_valley_solution(letter_grid, restrictions, grid)
+        if not passed:
+            failures.append(name)
+    return failures
+
+def reference_connected_numbers(board, row, col):
+    """
+    Finds the set of connected numbers at a cell with the recursive traversal
+    the game was first written with, which keeps its visits in a set of tuples.
+
+    Parameters:
+    - board (list): representing the game board, -1 for empty cells.
+    - row (int): Row coordinate of the cell.
+    - col (int): Column coordinate of the cell.
+
+    Returns:
+    - tuple: A set of coordinates of connected numbers and the selected number.
+    """
+    row_count, col_count = len(board), len(board[0])
+    number = board[row][col]
+    region = set()
+
+    def dfs(row, col):
+        if not (0 <= row < row_count and 0 <= col < col_count) or board[row][col] != number or (row, col) in region:
+            return
+        region.add((row, col))
+        dfs(row - 1, col)
+        dfs(row + 1, col)
+        dfs(row, col + 1)
+        dfs(row, col - 1)
+
+    dfs(row, col)
+    return region, number
+
+def reference_pop(board, row, col):
+    """
+    Pops a cell with the list-board move of the original game: the set found
+    by reference_connected_numbers goes through remove_cells, gravite_numbers,
+    shift_row_to_bottom, replace_minus_one_with_space and shift_left_col.
+
+    Parameters:
+    - board (list): representing the game board, -1 for empty cells.
+    - row (int): Row coordinate of the cell.
+    - col (int): Column coordinate of the cell.
+
+    Returns:
+    - tuple: The new board (' ' for empty cells) and the points gained, or None if the cell is empty.
+    """
+    # Cells already empty are spaces in the game; -1 only marks the cells a move removes.
+    board = [[' ' if cell == -1 else cell for cell in line] for line in board]
+    if board[row][col] == ' ':
+        return None
+    region, number = reference_connected_numbers(board, row, col)
+    if len(region) == 1:
+        return board, 0
+    assignment3.remove_cells(board, region)
+    assignment3.gravite_numbers(board)
+    assignment3.shift_row_to_bottom(board, row)
+    assignment3.replace_minus_one_with_space(board)
+    assignment3.shift_left_col(board, col)
+    return board, number * len(region)
+
+def check_pop_game(seed):
+    """
+    The game has no sample outputs, so is_game_over, gravite_numbers, the
+    flood fills of the list board and of the compact columns, and pop are
+    compared with plain reference versions on generated boards.
+
+    Parameters:
+    - seed (int): Seed of the generated boards.
+
+    Returns:
+    - dict: Descriptions of the boards every operation of POP_GAME_OPERATIONS gets wrong.
+    """
+    rnd = random.Random(seed)
+    failures = {operation: [] for operation in POP_GAME_OPERATIONS}
+    for index in range(200):
+        board = generate_pop_board(rnd.randint(1, 12), rnd.randint(1, 12), rnd.randint(1, 5), rnd, rnd.random())
+        row_count, col_count = len(board), len(board[0])
+        has_pair = any(board[row][col] != -1 and
+                       ((row + 1 < row_count and board[row + 1][col] == board[row][col]) or
+                        (col + 1 < col_count and board[row][col + 1] == board[row][col]))
+                       for row in range(row_count) for col in range(col_count))
+        if assignment3.is_game_over(board) == has_pair:
+            failures["is_game_over"].append("board {}".format(index))
+
+        fallen = [row[:] for row in board]
+        assignment3.gravite_numbers(fallen)
+        for col in range(col_count):
+            numbers = [board[row][col] for row in range(row_count) if board[row][col] != -1]
+            if [fallen[row][col] for row in range(row_count)] != [-1] * (row_count - len(numbers)) + numbers:
+                failures["gravite_numbers"].append("board {}".format(index))
+                break
+
+        columns = assignment3.board_to_columns(board)
+        for move in range(4):
+            row, col = rnd.randrange(row_count), rnd.randrange(col_count)
+            if board[row][col] == -1:
+                continue
+            expected = reference_connected_numbers(board, row, col)
+            region, number = assignment3.find_set_of_connected_numbers_in_columns(columns, col, row_count - 1 - row)
+            if (assignment3.find_set_of_connected_numbers(board, row, col) != expected or
+                    ({(row_count - 1 - level, cell_col) for cell_col, level in region}, number) != expected):
+                failures["flood_fill"].append("board {}, cell ({}, {})".format(index, row, col))
+                break
+
+        for move in range(4):
+            row, col = rnd.randrange(row_count), rnd.randrange(col_count)
+            expected = reference_pop(board, row, col)
+            try:
+                result = assignment3.pop(board, row, col)
+            except ValueError:
+                result = None
+            if result != expected:
+                failures["pop"].append("board {}, cell ({}, {})".format(index, row, col))
+                break
+    return failures
+
+def generate_sudoku(blanks, rnd, box_size=3):
+    """
+    Makes a Sudoku by shuffling the rows, columns and numbers of a pattern
+    solution and emptying random squares.
+
+    Parameters:
+    - blanks (int): Number of empty squares.
+    - rnd (random.Random): Random number generator.
+    - box_size (int): Submatrix side length.
+
+    Returns:
+    - bytearray: Sudoku grid.
+    """
+    size = box_size * box_size
+
+    def shuffled_lines():
+        bands = rnd.sample(range(box_size), box_size)
+        return [band * box_size + line for band in bands for line in rnd.sample(range(box_size), box_size)]
+
+    rows, cols = shuffled_lines(), shuffled_lines()
+    numbers = rnd.sample(range(1, size + 1), size)
+    grid = bytearray(numbers[(box_size * (row % box_size) + row // box_size + col) % size]
+                     for row in rows for col in cols)
+    for square in rnd.sample(range(size * size), blanks):
+        grid[square] = 0
+    return grid
+
+def generate_blind_valley(row_count, col_count, density, rnd):
+    """
+    Makes a solvable Blind Valley puzzle: random dominoes, a random valid
+    filling of them, and its counts, each kept with the given chance.
+
+    Parameters:
+    - row_count (int): Number of rows.
+    - col_count (int): Number of columns; row_count * col_count must be even.
+    - density (float): Chance of every count to be given instead of -1.
+    - rnd (random.Random): Random number generator.
+
+    Returns:
+    - tuple: The letter grid and the restrictions.
+    """
+    if row_count * col_count % 2:
+        raise ValueError("A board of dominoes needs an even number of cells.")
+
+    def place_dominoes():
+        # Returns None when a cell of the last row is left without a partner.
+        letter_grid = [[None] * col_count for _ in range(row_count)]
+        for row in range(row_count):
+            for col in range(col_count):
+                if letter_grid[row][col]:
+                    continue
+                right = col + 1 < col_count and letter_grid[row][col + 1] is None
+                if right and (row + 1 == row_count or rnd.random() < 0.5):
+                    letter_grid[row][col], letter_grid[row][col + 1] = "L", "R"
+                elif row + 1 < row_count:
+                    letter_grid[row][col], letter_grid[row + 1][col] = "U", "D"
+                else:
+                    return None
+        return letter_grid
+
+    letter_grid = place_dominoes()
+    while letter_grid is None:
+        letter_grid = place_dominoes()
+
+    grid = [[None] * col_count for _ in range(row_count)]
+    for row in range(row_count):
+        for col in range(col_count):
+            if letter_grid[row][col] not in "LU":
+                continue
+            partner = (row, col + 1) if letter_grid[row][col] == "L" else (row + 1, col)
+            options = []
+            for pair in ["HB", "BH", "NN"]:
+                cells = [(row, col, pair[0]), (partner[0], partner[1], pair[1])]
+                if all(symbol == "N" or all(
+                        not (0 <= next_row < row_count and 0 <= next_col < col_count) or
+                        (next_row, next_col) in [(row, col), partner] or grid[next_row][next_col] != symbol
+                        for next_row, next_col in [(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)])
+                       for r, c, symbol in cells):
+                    options.append(pair)
+            pair = rnd.choice(options)
+            grid[row][col], grid[partner[0]][partner[1]] = pair[0], pair[1]
+
+    def given(count):
+        return count if rnd.random() < density else -1
+
+    columns = [[grid[row][col] for row in range(row_count)] for col in range(col_count)]
+    restrictions = [[given(row.count("H")) for row in grid], [given(row.count("B")) for row in grid],
+                    [given(column.count("H")) for column in columns], [given(column.count("B")) for column in columns]]
+    return letter_grid, restrictions
+
+def generate_pop_board(row_count, col_count, numbers, rnd, holes=0.0):
+    """
+    Makes a random board of the number popping game.
+
+    Parameters:
+    - row_count (int): Number of rows.
+    - col_count (int): Number of columns.
+    - numbers (int): Largest number on the board.
+    - rnd (random.Random): Random number generator.
+    - holes (float): Chance of every cell to be empty (-1).
+
+    Returns:
+    - list: representing the game board.
+    """
+    return [[-1 if rnd.random() < holes else rnd.randint(1, numbers) for _ in range(col_count)]
+            for _ in range(row_count)]
+
+def time_case(function, make_arguments, warmup, repeat, min_time):
+    """
+    Times a function. Every repetition calls it often enough to run for at
+    least min_time; the arguments are made before the clock starts, so
+    functions that change their arguments get fresh ones on every call.
+
+    Parameters:
+    - function (callable): Function to time.
+    - make_arguments (callable): Returns the argument tuple of one call.
+    - warmup (int): Untimed calls before the repetitions.
+    - repeat (int): Number of timed repetitions.
+    - min_time (float): Seconds every repetition should last.
+
+    Returns:
+    - dict: Calls per repetition, median and best seconds per call, calls per
+    second and the peak memory of one call in bytes.
+    """
+    for _ in range(warmup):
+        function(*make_arguments())
+
+    # One timed call tells how many calls fill min_time.
+    arguments = make_arguments()
+    start = time.perf_counter()
+    function(*arguments)
+    single = time.perf_counter() - start
+    number = max(1, min(100000, int(min_time / max(single, 1e-9))))
+
+    per_call = []
+    for _ in range(repeat):
+        calls = [make_arguments() for _ in range(number)]
+        start = time.perf_counter()
+        for arguments in calls:
+            function(*arguments)
+        per_call.append((time.perf_counter() - start) / number)
+
+    # Memory is traced on a separate call, since tracing slows every allocation down.
+    arguments = make_arguments()
+    tracemalloc.start()
+    function(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(per_call)
+    return {"number": number, "median": median, "best": min(per_call),
+            "ops_per_sec": 1 / median if median else None, "peak_memory": peak}
+
+def solve_within(function, arguments, timeout):
+    """
+    Calls a function in a separate process and stops it after timeout
+    seconds, since the slowest engines can search a single puzzle for hours.
+
+    Parameters:
+    - function (callable): Function to call; it and its arguments must pickle.
+    - arguments (tuple): Its arguments.
+    - timeout (float): Seconds to wait for it.
+
+    Returns:
+    - tuple: True and the result, or False and None if it took too long.
+    """
+    pool = multiprocessing.Pool(1)
+    try:
+        return True, pool.apply_async(function, arguments).get(timeout)
+    except multiprocessing.TimeoutError:
+        return False, None
+    finally:
+        pool.terminate()
+        pool.join()
+
+def sudoku_cases(engines, blank_counts, puzzles, seed):
+    """
+    Builds the Sudoku cases: one per engine and number of empty squares, one
+    call solving one of the generated puzzles. Only the puzzles the engine
+    solves are timed, since the others stop early on an error; an engine that
+    solves none of them gets no argument maker.
+
+    Parameters:
+    - engines (list): Keys of sudoku.ENGINES.
+    - blank_counts (list): Numbers of empty squares.
+    - puzzles (int): Puzzles generated per number of empty squares.
+    - seed (int): Seed of the generated puzzles.
+
+    Returns:
+    - list: (case name, parameters, function, argument maker or None) of every case.
+    """
+    cases = []
+    for blanks in blank_counts:
+        rnd = random.Random("{}-{}".format(seed, blanks))
+        grids = [generate_sudoku(blanks, rnd) for _ in range(puzzles)]
+        for engine in engines:
+            solvable = [grid for grid in grids if solve_sudoku_grid(bytearray(grid), engine)]
+            cycle = itertools.cycle(solvable)
+            make_arguments = lambda cycle=cycle, engine=engine: (bytearray(next(cycle)), engine)
+            cases.append(("blanks={}".format(blanks),
+                          {"engine": engine, "blanks": blanks, "solved": len(solvable) / puzzles},
+                          solve_sudoku_grid, make_arguments if solvable else None))
+    return cases
+
+def blind_valley_cases(engines, sizes, densities, puzzles, seed, timeout):
+    """
+    Builds the Blind Valley cases: one per engine, board size and density of
+    the given counts, one call solving one of the generated puzzles. The
+    puzzles an engine finishes within timeout are timed, whatever it answers;
+    solved tells how many it answers with a grid that follows the rules, and
+    an engine that finishes none of them gets no argument maker.
+
+    Parameters:
+    - engines (list): Names from blind_valley.ENGINES.
+    - sizes (list): (rows, columns) of the boards.
+    - densities (list): Chances of every count to be given.
+    - puzzles (int): Puzzles generated per size and density.
+    - seed (int): Seed of the generated puzzles.
+    - timeout (float): Seconds an engine may search one puzzle.
+
+    Returns:
+    - list: (case name, parameters, function, argument maker or None) of every case.
+    """
+    cases = []
+    for (row_count, col_count), density in itertools.product(sizes, densities):
+        rnd = random.Random("{}-{}-{}-{}".format(seed, row_count, col_count, density))
+        instances = [generate_blind_valley(row_count, col_count, density, rnd) for _ in range(puzzles)]
+        for engine in engines:
+            finished = []
+            solved = 0
+            for letter_grid, restrictions in instances:
+                done, grid = solve_within(blind_valley.solve, (letter_grid, restrictions, engine), timeout)
+                if done:
+                    finished.append((letter_grid, restrictions))
+                    solved += grid is not None and is_blind_valley_solution(letter_grid, restrictions, grid)
+            cycle = itertools.cycle(finished)
+            make_arguments = lambda cycle=cycle, engine=engine: next(cycle) + (engine,)
+            cases.append(("{}x{} density={}".format(row_count, col_count, density),
+                          {"engine": engine, "rows": row_count, "columns": col_count, "density": density,
+                           "solved": solved / puzzles, "timed_out": puzzles - len(finished)},
+                          blind_valley.solve, make_arguments if finished else None))
+    return cases
+
+def pop_game_cases(operations, sizes, numbers, seed):
+    """
+    Builds the cases of the number popping game: one per operation and board
+    size. gravite_numbers gets boards with a quarter of the cells empty, and
+    flood_fill (find_set_of_connected_numbers) and pop get a cell of a set
+    that can be popped, when the board has one.
+
+    Parameters:
+    - operations (list): Names from POP_GAME_OPERATIONS.
+    - sizes (list): (rows, columns) of the boards.
+    - numbers (int): Largest number on the boards.
+    - seed (int): Seed of the generated boards.
+
+    Returns:
+    - list: (case name, parameters, function, argument maker) of every case.
+    """
+    cases = []
+    for row_count, col_count in sizes:
+        rnd = random.Random("{}-{}-{}".format(seed, row_count, col_count))
+        board = generate_pop_board(row_count, col_count, numbers, rnd)
+        holed = generate_pop_board(row_count, col_count, numbers, rnd, 0.25)
+        cell = next(((row, col) for row in range(row_count) for col in range(col_count - 1)
+                     if board[row][col] == board[row][col + 1]), (0, 0))
+        makers = {
+            "is_game_over": (assignment3.is_game_over, lambda board=board: (board,)),
+            "gravite_numbers": (assignment3.gravite_numbers, lambda holed=holed: ([row[:] for row in holed],)),
+            "flood_fill": (assignment3.find_set_of_connected_numbers,
+                           lambda board=board, cell=cell: (board,) + cell),
+            "pop": (assignment3.pop, lambda board=board, cell=cell: (board,) + cell),
+        }
+        for operation in operations:
+            function, make_arguments = makers[operation]
+            cases.append(("{}x{}".format(row_count, col_count),
+                          {"engine": operation, "rows": row_count, "columns": col_count, "numbers": numbers},
+                          function, make_arguments))
+    return cases
+
+def parse_size(text):
+    """
+    Reads a ROWSxCOLUMNS board size for argparse.
+
+    Parameters:
+    - text (str): Size like "8x8".
+
+    Returns:
+    - tuple: (rows, columns).
+    """
+    try:
+        row_count, col_count = map(int, text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected ROWSxCOLUMNS, got {!r}".format(text))
+    return row_count, col_count
+
+def compare_results(results, previous):
+    """
+    Prints how the calls per second of every case changed since an earlier run.
+
+    Parameters:
+    - results (list): Results of this run.
+    - previous (dict): JSON output of the earlier run.
+
+    Returns:
+    - None
+    """
+    before = {(result["suite"], result["case"], result["engine"]): result for result in previous["results"]}
+    print("\nCompared with {}:".format(previous["meta"]["time"]))
+    for result in results:
+        old = before.get((result["suite"], result["case"], result["engine"]))
+        if old and old["ops_per_sec"] and result["ops_per_sec"]:
+            print("{:<14} {:<28} {:<16} {:>7.2f}x".format(result["suite"], result["case"], result["engine"],
+                                                          result["ops_per_sec"] / old["ops_per_sec"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the solvers against the sample outputs and times them "
+                                                 "on generated workloads.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--sudoku-engines", nargs="+", choices=sorted(sudoku.ENGINES), default=sorted(sudoku.ENGINES))
+    parser.add_argument("--sudoku-blanks", nargs="+", type=int, default=[30, 45, 55, 60],
+                        help="numbers of empty squares of the generated Sudokus")
+    parser.add_argument("--blind-valley-engines", nargs="+", choices=blind_valley.ENGINES,
+                        default=blind_valley.ENGINES)
+    parser.add_argument("--blind-valley-sizes", nargs="+", type=parse_size, default=[(4, 4), (6, 6), (8, 8)],
+                        metavar="ROWSxCOLUMNS")
+    parser.add_argument("--blind-valley-densities", nargs="+", type=float, default=[0.5, 1.0],
+                        help="chances of every count to be given")
+    parser.add_argument("--blind-valley-timeout", type=float, default=10,
+                        help="seconds an engine may search one puzzle; slower puzzles are left out of its timing")
+    parser.add_argument("--pop-operations", nargs="+", choices=POP_GAME_OPERATIONS, default=POP_GAME_OPERATIONS)
+    parser.add_argument("--pop-sizes", nargs="+", type=parse_size, default=[(10, 10), (20, 20), (40, 40), (80, 80)],
+                        metavar="ROWSxCOLUMNS")
+    parser.add_argument("--pop-numbers", type=int, default=4, help="largest number on the generated boards")
+    parser.add_argument("--puzzles", type=int, default=8, help="puzzles generated per Sudoku and Blind Valley case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed calls before every case")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions of every case")
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds every repetition should last")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    # Every engine is checked against the samples before anything is timed;
+    # engines that fail are still timed, and their results are marked.
+    checks = {}
+    if "sudoku" in args.suites:
+        for engine in args.sudoku_engines:
+            checks["sudoku", engine] = check_sudoku(engine)
+    if "blind_valley" in args.suites:
+        for engine in args.blind_valley_engines:
+            checks["blind_valley", engine] = check_blind_valley(engine)
+    if "pop_game" in args.suites:
+        failures = check_pop_game(args.seed)
+        for operation in args.pop_operations:
+            checks["pop_game", operation] = failures[operation]
+    for (suite, engine), failures in checks.items():
+        if failures:
+            print("Check failed: {} {} ({})".format(suite, engine, ", ".join(failures)))
+
+    cases = []
+    if "sudoku" in args.suites:
+        cases += [("sudoku",) + case for case in
+                  sudoku_cases(args.sudoku_engines, args.sudoku_blanks, args.puzzles, args.seed)]
+    if "blind_valley" in args.suites:
+        cases += [("blind_valley",) + case for case in
+                  blind_valley_cases(args.blind_valley_engines, args.blind_valley_sizes,
+                                     args.blind_valley_densities, args.puzzles, args.seed,
+                                     args.blind_valley_timeout)]
+    if "pop_game" in args.suites:
+        cases += [("pop_game",) + case for case in
+                  pop_game_cases(args.pop_operations, args.pop_sizes, args.pop_numbers, args.seed)]
+
+    results = []
+    print("{:<14} {:<28} {:<16} {:>12} {:>12} {:>10}".format("suite", "case", "engine", "ops/sec", "median ms",
+                                                             "peak KiB"))
+    for suite, case, parameters, function, make_arguments in cases:
+        failures = checks[suite, parameters["engine"]]
+        result = {"suite": suite, "case": case, "check": "failed" if failures else "passed"}
+        result.update(parameters)
+        notes = ["check failed"] if failures else []
+        if parameters.get("solved", 1) < 1:
+            notes.append("solved {:.0%}".format(parameters["solved"]))
+        if parameters.get("timed_out"):
+            notes.append("{} timed out".format(parameters["timed_out"]))
+        if make_arguments is None:
+            # Kept in the report and the JSON output, so the engine does not just disappear.
+            result.update({"failed": True, "ops_per_sec": None, "median": None, "peak_memory": None})
+            results.append(result)
+            print("{:<14} {:<28} {:<16} {:>12}  ({})".format(suite, case, parameters["engine"], "failed",
+                                                            ", ".join(notes)))
+            continue
+        result.update(time_case(function, make_arguments, args.warmup, args.repeat, args.min_time))
+        results.append(result)
+        print("{:<14} {:<28} {:<16} {:>12.1f} {:>12.4f} {:>10.1f}{}".format(
+            suite, case, parameters["engine"], result["ops_per_sec"] or 0, result["median"] * 1000,
+            result["peak_memory"] / 1024, "  ({})".format(", ".join(notes)) if notes else ""))
+
+    meta = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "arguments": sys.argv[1:]}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare_results(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
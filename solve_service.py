@@ -0,0 +1,484 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+if __name__ == "__main__":
+    # Run as a script, the solvers are imported from their assignment
+    # directories; importers put those on the module search path themselves.
+    sys.path[:0] = [os.path.join(ROOT, name) for name in ["Assignment2", "Assignment3", "Assignment4"]]
+
+import assignment3
+import blind_valley
+import sudoku
+
+REQUEST_TYPES = ["sudoku", "blind_valley", "pop"]
+# Longest request line the server reads, enough for the largest boards.
+LINE_LIMIT = 1 << 24
+
+def solve_sudoku_request(request, deadline):
+    """
+    Solves a Sudoku given as a one-line puzzle (see sudoku.parse_sudoku_line) or
+    as the rows of a Sudoku file.
+
+    Parameters:
+    - request (dict): "puzzle" and optionally "engine" (default: search).
+    - deadline (float): time.time() after which the request is answered with a timeout.
+
+    Returns:
+    - dict: "solution" as a one-line Sudoku.
+    """
+    text = request["puzzle"]
+    grid = sudoku.parse_sudoku_text(text) if len(text.split()) > 1 else sudoku.parse_sudoku_line(text)
+    if sudoku.has_conflicting_clues(grid):
+        raise ValueError("Sudoku has no solution.")
+    for step in sudoku.ENGINES[request.get("engine", "search")](grid, sudoku.count_zeros(grid)):
+        pass
+    return {"solution": sudoku.sudoku_to_line(grid)}
+
+def solve_blind_valley_request(request, deadline):
+    """
+    Solves a Blind Valley puzzle. The mrv and propagate engines give up at the
+    deadline; the backtracking engines run to the end.
+
+    Parameters:
+    - request (dict): "letters" (rows of 'L', 'R', 'U' and 'D' as strings or
+    lists), "restrictions" (the four lists of counts) and optionally "engine"
+    (default: mrv, the fastest; fully clued boards above 12x12 may time out).
+    - deadline (float): time.time() after which the request is answered with a timeout.
+
+    Returns:
+    - dict: "solution" as a list of rows of 'H', 'B' and 'N', or None if there is no solution.
+    """
+    letter_grid = [list(row.replace(" ", "")) if isinstance(row, str) else list(row) for row in request["letters"]]
+    restrictions = request["restrictions"]
+    engine = request.get("engine", "mrv")
+    if engine in ["propagate", "mrv"]:
+        solver = blind_valley.PropagationSolver(letter_grid, restrictions, engine == "mrv")
+        solution = solver.solve(lambda: time.time() > deadline)
+        if solution is None and time.time() > deadline:
+            raise TimeoutError("timeout")
+    else:
+        solution = blind_valley.solve(letter_grid, restrictions, engine)
+    return {"solution": None if solution is None else ["".join(row) for row in solution]}
+
+def solve_pop_request(request, deadline):
+    """
+    Pops the set of connected numbers at a cell of a game board.
+
+    Parameters:
+    - request (dict): "board" (rows of numbers, -1 or " " for empty cells), "row" and "col".
+    - deadline (float): Unused, a move is always quick.
+
+    Returns:
+    - dict: The new "board" (" " for empty cells), the "points" gained and "game_over".
+    """
+    board, points = assignment3.pop(request["board"], request["row"], request["col"])
+    return {"board": board, "points": points, "game_over": assignment3.is_game_over(board)}
+
+SOLVERS = {
+    "sudoku": solve_sudoku_request,
+    "blind_valley": solve_blind_valley_request,
+    "pop": solve_pop_request,
+}
+
+def solve_requests(batch):
+    """
+    Answers a batch of requests. Runs inside the worker processes; requests
+    whose deadline passed while they waited are not started.
+
+    Parameters:
+    - batch (list): (request, deadline) pairs.
+
+    Returns:
+    - list: The response of every request, in order.
+    """
+    responses = []
+    for request, deadline in batch:
+        if time.time() > deadline:
+            responses.append({"ok": False, "error": "timeout"})
+            continue
+        try:
+            response = SOLVERS[request["type"]](request, deadline)
+            response["ok"] = True
+        except TimeoutError:
+            response = {"ok": False, "error": "timeout"}
+        except (ValueError, KeyError, IndexError, TypeError) as error:
+            # A malformed request only fails itself, not the rest of the batch.
+            response = {"ok": False, "error": "{}: {}".format(type(error).__name__, error)}
+        responses.append(response)
+    return responses
+
+class SolveService:
+    """
+    Answers solve requests from many connections with one process pool.
+    Requests wait in a queue; a batcher takes up to batch_size of them, waiting
+    at most batch_window seconds for more after the first, and sends them to a
+    worker as one task. Only as many batches as there are workers run at once,
+    so a busy pool makes the batches larger instead of the pool's own queue longer.
+    """
+
+    def __init__(self, workers=None, batch_size=32, batch_window=0.002, timeout=10.0, cache=None):
+        """
+        Parameters:
+        - workers (int): Worker processes, None for one per CPU core.
+        - batch_size (int): Most requests sent to a worker at once.
+        - batch_window (float): Seconds a batch waits for more requests.
+        - timeout (float): Default and longest seconds a request may take.
+        - cache (str): sqlite file of a Sudoku solution cache the workers share, None for none.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.cache = cache
+        self.pool = self.new_pool()
+        self.queue = None
+        self.slots = None
+        self.in_flight = 0
+        self.counters = {"requests": 0, "completed": 0, "errors": 0, "timeouts": 0, "batches": 0,
+                         "batched_requests": 0, "max_queue_depth": 0, "pool_restarts": 0}
+        self.seconds = 0.0
+
+    def new_pool(self):
+        """
+        Returns:
+        - concurrent.futures.ProcessPoolExecutor: A pool of the workers, sharing the solution cache if there is one.
+        """
+        initializer, initargs = (sudoku.enable_solution_cache, (self.cache,)) if self.cache else (None, ())
+        return concurrent.futures.ProcessPoolExecutor(self.workers, initializer=initializer, initargs=initargs)
+
+    def replace_pool(self, pool):
+        """
+        Replaces a broken pool, unless another batch already did.
+
+        Parameters:
+        - pool (concurrent.futures.ProcessPoolExecutor): The broken pool.
+
+        Returns:
+        - concurrent.futures.ProcessPoolExecutor: The pool to use from now on.
+        """
+        if self.pool is pool:
+            self.pool = self.new_pool()
+            self.counters["pool_restarts"] += 1
+            pool.shutdown(wait=False)
+        return self.pool
+
+    def metrics(self):
+        """
+        Returns:
+        - dict: Queue depth, batches running and the counters since the start.
+        """
+        metrics = dict(self.counters)
+        metrics["queue_depth"] = self.queue.qsize()
+        metrics["in_flight_batches"] = self.in_flight
+        metrics["mean_batch_size"] = (self.counters["batched_requests"] / self.counters["batches"]
+                                      if self.counters["batches"] else 0)
+        metrics["mean_latency"] = self.seconds / self.counters["completed"] if self.counters["completed"] else 0
+        return metrics
+
+    async def submit(self, request):
+        """
+        Queues a request and waits for its response.
+
+        Parameters:
+        - request (dict): "type" (one of REQUEST_TYPES), the fields of its solver
+        and optionally "id" and "timeout" (seconds, at most the service timeout).
+
+        Returns:
+        - dict: The response, with "ok", the "id" of the request and either the
+        result fields or "error".
+        """
+        start = time.time()
+        self.counters["requests"] += 1
+        if request.get("type") == "metrics":
+            response = {"ok": True, "metrics": self.metrics()}
+            if "id" in request:
+                response["id"] = request["id"]
+            return response
+
+        try:
+            if request.get("type") not in REQUEST_TYPES:
+                raise ValueError("unknown request type {!r}".format(request.get("type")))
+            timeout = float(request.get("timeout", self.timeout))
+            # Also rejects NaN, which compares False with everything.
+            if not timeout > 0:
+                raise ValueError("timeout must be a positive number of seconds, got {!r}".format(
+                    request.get("timeout")))
+        except (TypeError, ValueError) as error:
+            response = {"ok": False, "error": "bad request: {}".format(error)}
+        else:
+            timeout = min(timeout, self.timeout)
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((request, start + timeout, future))
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.queue.qsize())
+            try:
+                response = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                response = {"ok": False, "error": "timeout"}
+
+        if response["ok"]:
+            self.counters["completed"] += 1
+            self.seconds += time.time() - start
+        elif response["error"] == "timeout":
+            self.counters["timeouts"] += 1
+        else:
+            self.counters["errors"] += 1
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def run_batch(self, batch):
+        """
+        Solves a batch on the pool and hands the responses to the waiting requests.
+        A worker that dies (killed, out of memory) breaks the whole pool and
+        fails the batches running on it; the first batch to see that replaces
+        the pool, and a batch that finds it broken before starting runs on the new one.
+
+        Parameters:
+        - batch (list): (request, deadline, future) of every request.
+
+        Returns:
+        - None
+        """
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        pairs = [(request, deadline) for request, deadline, future in batch]
+        pool = self.pool
+        try:
+            try:
+                call = loop.run_in_executor(pool, solve_requests, pairs)
+            except concurrent.futures.BrokenExecutor:
+                # Broken while idle, so nothing of this batch ran yet.
+                pool = self.replace_pool(pool)
+                call = loop.run_in_executor(pool, solve_requests, pairs)
+            responses = await call
+        except Exception as error:
+            if isinstance(error, concurrent.futures.BrokenExecutor):
+                self.replace_pool(pool)
+            # One dict per request, since submit adds the id of its own request.
+            responses = [{"ok": False, "error": "{}: {}".format(type(error).__name__, error)} for item in batch]
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+        for (request, deadline, future), response in zip(batch, responses):
+            # Requests that timed out meanwhile were cancelled.
+            if not future.done():
+                future.set_result(response)
+
+    async def run_batcher(self):
+        """
+        Forms batches from the queue for as long as the service runs.
+
+        Returns:
+        - None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            end = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), end - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                self.slots.release()
+                continue
+            self.counters["batches"] += 1
+            self.counters["batched_requests"] += len(batch)
+            asyncio.ensure_future(self.run_batch(batch))
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests of a connection: one JSON object per line in, one
+        JSON response per line out. Requests are answered as they finish, so
+        the responses can come back in another order; the "id" tells them apart,
+        and a request reusing the id of one still running is turned down.
+
+        Parameters:
+        - reader (asyncio.StreamReader)
+        - writer (asyncio.StreamWriter)
+
+        Returns:
+        - None
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+        running_ids = set()
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as error:
+                self.counters["requests"] += 1
+                self.counters["errors"] += 1
+                response = {"ok": False, "error": "bad request: {}".format(error)}
+            else:
+                # Ids may be any JSON value, so they are compared as JSON text.
+                key = json.dumps(request["id"], sort_keys=True) if "id" in request else None
+                if key is not None and key in running_ids:
+                    self.counters["requests"] += 1
+                    self.counters["errors"] += 1
+                    response = {"ok": False, "id": request["id"],
+                                "error": "bad request: id {} is already running".format(key)}
+                else:
+                    if key is not None:
+                        running_ids.add(key)
+                    try:
+                        response = await self.submit(request)
+                    finally:
+                        running_ids.discard(key)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def report_metrics(self, interval):
+        """
+        Writes the metrics to standard error every interval seconds.
+
+        Parameters:
+        - interval (float): Seconds between two reports.
+
+        Returns:
+        - None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.metrics()), file=sys.stderr, flush=True)
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None, metrics_interval=None, ready=None):
+        """
+        Runs the service until it is cancelled.
+
+        Parameters:
+        - host (str), port (int): TCP address, used when path is None.
+        - path (str): Unix socket to listen on instead of TCP.
+        - metrics_interval (float): Seconds between metrics reports on standard error, None for none.
+        - ready (asyncio.Event): Set once the service accepts connections.
+
+        Returns:
+        - None
+        """
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+        background = [asyncio.ensure_future(self.run_batcher())]
+        if metrics_interval:
+            background.append(asyncio.ensure_future(self.report_metrics(metrics_interval)))
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in background:
+                task.cancel()
+            self.pool.shutdown(wait=False)
+
+async def send_requests(requests, host="127.0.0.1", port=8765, path=None):
+    """
+    Sends requests over one connection and collects their responses.
+
+    Parameters:
+    - requests (list): Request dicts; every request without an "id" gets its index as id.
+    The responses are matched by id, so the ids must differ.
+    - host (str), port (int): TCP address, used when path is None.
+    - path (str): Unix socket of the service.
+
+    Returns:
+    - list: The responses in the order of the requests.
+    """
+    requests = [dict(request, id=request.get("id", index)) for index, request in enumerate(requests)]
+    keys = [json.dumps(request["id"], sort_keys=True) for request in requests]
+    if len(set(keys)) != len(keys):
+        duplicate = next(key for index, key in enumerate(keys) if key in keys[:index])
+        raise ValueError("request id {} is used more than once".format(duplicate))
+
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+    for request in requests:
+        writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+
+    responses = {}
+    while len(responses) < len(requests):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("the service closed the connection")
+        response = json.loads(line)
+        responses[json.dumps(response.get("id"), sort_keys=True)] = response
+    writer.close()
+    return [responses[key] for key in keys]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the Sudoku, Blind Valley and number popping game solvers "
+                                                 "over a local socket, one JSON request per line.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    serve = commands.add_parser("serve", help="run the service")
+    send = commands.add_parser("send", help="send the JSON requests of a file (one per line, - for standard "
+                                            "input) and print the responses")
+    for command in [serve, send]:
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", metavar="PATH", help="use this Unix socket instead of TCP")
+    serve.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    serve.add_argument("--batch-size", type=int, default=32, help="most requests sent to a worker at once")
+    serve.add_argument("--batch-window", type=float, default=0.002,
+                       help="seconds a batch waits for more requests after its first")
+    serve.add_argument("--timeout", type=float, default=10.0, help="default and longest seconds per request")
+    serve.add_argument("--cache", metavar="FILE", help="sqlite Sudoku solution cache shared by the workers")
+    serve.add_argument("--metrics-interval", type=float, default=None,
+                       help="write the metrics to standard error every this many seconds")
+    send.add_argument("requests_file")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        service = SolveService(args.workers, args.batch_size, args.batch_window, args.timeout, args.cache)
+        try:
+            asyncio.run(service.serve(args.host, args.port, args.unix, args.metrics_interval))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.requests_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.requests_file, "r") as file:
+            lines = file.read().splitlines()
+    requests = [json.loads(line) for line in lines if line.strip()]
+    for response in asyncio.run(send_requests(requests, args.host, args.port, args.unix)):
+        print(json.dumps(response))
+
+if __name__ == "__main__":
+    main()